@@ -1,14 +1,19 @@
 """Flask app for handling OAuth 2.0 callbacks and some other basic stuff
 """
-from flask import Flask, request, render_template
+import csv
+import io
+import json
+
+from flask import Flask, Response, request, render_template, stream_with_context
 from httpx import HTTPError
 
 from commissar import ConfigLoader
-from commissar.core.data import Character, UserData, character_repo, server_rule_repo, server_repo
-from commissar.core.data import auth_attempt_repo, user_data_repo
+from commissar.core.data import Character, UserData, MemberEvent, character_repo, server_rule_repo, server_repo
+from commissar.core.data import auth_attempt_repo, user_data_repo, member_event_repo
 from commissar.core.esi.esi import ESI
 from commissar import LOGGER
 from commissar.core.oauth.helpers import validate
+from commissar.core.oauth.jwt_validator import JWTValidator
 from commissar.core.oauth.oauth_service import OAuthService
 from commissar.app import APP_NAME, AppException, Locale, Result, SOMETHING_WENT_WRONG, \
     CHARACTER_REGISTERED_SUCCESSFULLY, CHARACTER_ALREADY_REGISTERED, get_localized
@@ -79,6 +84,14 @@ def callback():
             )
             character_repo.save(c)
             LOGGER.info("Character registered successfully.")
+            # notify bot to grant roles right away
+            try:
+                member_event_repo.save(MemberEvent(
+                    discord_server_id=attempt.discord_server_id,
+                    discord_user_id=attempt.discord_user_id
+                ))
+            except Exception as e:
+                LOGGER.error(e, exc_info=True)
             status_code = 201
             result_code = 0
             result_text = Result.REGISTERED
@@ -110,6 +123,8 @@ def callback():
 def registered():
     discord_server_id = request.args.get('discord_server_id')
     page = request.args.get('page', 1, type=int)
+    after = request.args.get('after', None, type=int)
+    before = request.args.get('before', None, type=int)
     status_code = 200
     locale = Locale.en_US
     try:
@@ -120,8 +135,8 @@ def registered():
         if server is None:
             raise AppException(404, 101, "Server settings not found")
         locale = server.locale
-        registered_users = user_data_repo.find_by_server_id_paginate(discord_server_id, page, 10)
-        if len(registered_users) == 0:
+        registered_users = user_data_repo.find_by_server_id_paginate(discord_server_id, after, before, page, 10)
+        if len(registered_users['users']) == 0:
             raise AppException(404, 102, "No registered users returned")
         return render_template(
             "registered.html",
@@ -157,7 +172,75 @@ def registered():
         ), status_code
 
 
+EXPORT_COLUMNS = ['discord_user_id', 'discord_user_name', 'character_id', 'character_name', 'corporation_id',
+                  'alliance_id']
+
+
+def export_csv(discord_server_id: int):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    for row in user_data_repo.stream_by_server_id(discord_server_id):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        yield buffer.getvalue()
+
+
+def export_jsonl(discord_server_id: int):
+    for row in user_data_repo.stream_by_server_id(discord_server_id):
+        yield json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n"
+
+
+EXPORT_FORMATS = {
+    'csv': (export_csv, 'text/csv'),
+    'jsonl': (export_jsonl, 'application/x-ndjson'),
+}
+
+
+@app.route('/reports/registered.<export_format>', methods=['GET'])
+def registered_export(export_format: str):
+    discord_server_id = request.args.get('discord_server_id')
+    try:
+        if export_format not in EXPORT_FORMATS or discord_server_id is None:
+            raise AppException(400, 100, "Bad Request")
+        discord_server_id = int(discord_server_id)
+        server = server_repo.find(discord_server_id)
+        if server is None:
+            raise AppException(404, 101, "Server settings not found")
+        generator, mimetype = EXPORT_FORMATS[export_format]
+        # rows are streamed from database cursor, nothing is accumulated in memory
+        return Response(
+            stream_with_context(generator(discord_server_id)),
+            mimetype=mimetype,
+            headers={
+                "Content-Disposition": "attachment; filename=registered_{}.{}".format(discord_server_id, export_format)
+            }
+        )
+    except AppException as e:
+        LOGGER.error(e)
+        return render_template(
+            "result.html",
+            title=APP_NAME,
+            result_code=e.error_code,
+            result_text=Result.FAIL,
+            message=e.error_message
+        ), e.http_status_code
+    except Exception as e:
+        LOGGER.error(e, exc_info=True)
+        return render_template(
+            "result.html",
+            title=APP_NAME,
+            result_code=-1,
+            result_text=Result.FAIL,
+            message=get_localized(SOMETHING_WENT_WRONG, Locale.en_US)
+        ), 503
+
+
 def start():
+    ESI().entity_cache.warm()
+    JWTValidator.start_background_refresh()
     app.run(
         host=host,
         port=port,
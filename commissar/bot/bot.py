@@ -7,6 +7,7 @@ from commissar.bot.cogs.auto_cog import AutoCog
 from commissar.bot.cogs.public_cog import PublicCog
 from commissar.bot.cogs.reports_cog import ReportsCog
 from commissar.bot.cogs.rules_cog import RulesCog
+from commissar.core.esi.esi import ESI
 from commissar import SingletonMeta
 from commissar import ConfigLoader
 from commissar import LOGGER
@@ -42,5 +43,6 @@ class CommissarBot(commands.Bot, metaclass=SingletonMeta):
 def start() -> None:
     cfg = ConfigLoader().config
     token = os.environ["discord_token"]
+    ESI().entity_cache.warm()
     bot = CommissarBot()
     bot.run(token)
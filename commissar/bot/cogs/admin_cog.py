@@ -6,8 +6,7 @@ from nextcord.ext import commands
 from commissar.bot import *
 from commissar.bot.localizations import *
 from commissar.bot.response import bot_response, bot_response_multi
-from commissar.core.data import character_repo, Character, UserData, server_repo, Server
-from commissar.core.data import user_data_repo
+from commissar.core.data import aio, Character, UserData, Server
 from commissar.core.esi.esi import ESI
 from commissar import LOGGER
 
@@ -49,13 +48,13 @@ class AdminCog(commands.Cog):
             if interaction.guild is None:
                 raise BotException(get_localized(GUILD_ONLY, loc))
             _locale = Locale[locale].name
-            server = server_repo.find_or_create(interaction.guild.id, interaction.guild.name)
+            server = await aio.server_repo.find_or_create(interaction.guild.id, interaction.guild.name)
             print('channel')
             print(channel)
             server.discord_channel_id = channel.id
             server.discord_channel_name = channel.name
             server.locale = locale
-            server_repo.save(server)
+            await aio.server_repo.save(server)
             await bot_response(interaction, get_localized(SERVER_SETTINGS_UPDATED, loc).format(
                 interaction.guild.name, channel.mention, _locale
             ))
@@ -101,21 +100,23 @@ class AdminCog(commands.Cog):
         try:
             if interaction.guild is None:
                 raise BotException(get_localized(GUILD_ONLY, loc))
-            server_repo.find_or_create(interaction.guild.id, interaction.guild.name)
+            # ESI call can be slow, respond later
+            await interaction.response.defer(ephemeral=True)
+            await aio.server_repo.find_or_create(interaction.guild.id, interaction.guild.name)
             # check character with ESI
-            data = ESI().get_character(character_id)
+            _, data = await ESI().async_get_character(character_id)
             if data is None:
                 raise BotException(get_localized(CHARACTER_NOT_FOUND, loc).format(character_id))
-            u = user_data_repo.find(interaction.guild.id, member.id)
+            u = await aio.user_data_repo.find(interaction.guild.id, member.id)
             if u is None:
                 u = UserData(
                     discord_server_id=interaction.guild.id,
                     discord_user_id=member.id,
                     discord_user_name=member.name
                 )
-                user_data_repo.save(u)
+                await aio.user_data_repo.save(u)
             else:
-                character_ids = [c.id for c in u.characters]
+                character_ids = [c.character_id for c in u.characters]
                 if character_id in character_ids:
                     raise BotException(get_localized(CHARACTER_ALREADY_REGISTERED, loc).format(character_id))
             character_name = data['name']
@@ -129,7 +130,7 @@ class AdminCog(commands.Cog):
                 corporation_id=corporation_id,
                 alliance_id=alliance_id
             )
-            character_repo.save(c)
+            await aio.character_repo.save(c)
             messages.append(get_localized(CHARACTER_REGISTERED, loc).format(character_name, member.mention))
             # send response with all messages
             await bot_response_multi(interaction, messages)
@@ -161,7 +162,7 @@ class AdminCog(commands.Cog):
         try:
             if interaction.guild is None:
                 raise BotException(get_localized(GUILD_ONLY, loc))
-            u = user_data_repo.find(interaction.guild.id, member.id)
+            u = await aio.user_data_repo.find(interaction.guild.id, member.id)
             if u is None:
                 raise BotException(get_localized(USER_NOT_REGISTERED, loc).format(member.mention))
             # except default permissions
@@ -202,18 +203,15 @@ class AdminCog(commands.Cog):
                 raise BotException(get_localized(QUERY_STRING_TOO_SHORT, loc).format(self.MIN_QUERY_LENGTH))
             if interaction.guild is None:
                 raise BotException(get_localized(GUILD_ONLY, loc))
-            chars = character_repo.find_by_name(interaction.guild.id, character_name)
-            if chars is None:
-                raise BotException(get_localized(CHARACTER_NOT_FOUND, loc).format(character_name))
+            chars = await aio.character_repo.find_by_name(interaction.guild.id, character_name)
+            if len(chars) == 0:
+                raise BotException(get_localized(QUERY_CHARACTERS_NOT_FOUND, loc))
             messages.append(get_localized(CHARACTER_INFO_HEADER, loc))
-            count = 0
             for c in chars:
                 member = interaction.guild.get_member(c.user_data.discord_user_id)
                 _link = ZKILLBOARD_CHARACTER_URL_PATTERN.format(c.character_id)
-                messages.append("* [{}]({}) {}\n".format(c.character_name, _link, member.mention))
-                count += 1
-            if count == 0:
-                raise BotException(get_localized(QUERY_CHARACTERS_NOT_FOUND, loc))
+                mention = member.mention if member is not None else c.user_data.discord_user_name
+                messages.append("* [{}]({}) {}\n".format(c.character_name, _link, mention))
             # send response with all messages
             await bot_response_multi(interaction, messages)
         except BotException as e:
@@ -1,4 +1,5 @@
-from datetime import datetime, timezone
+import asyncio
+from datetime import datetime, timezone, timedelta
 
 import aiocron
 import nextcord
@@ -6,9 +7,14 @@ from croniter import croniter
 from nextcord import Locale
 from nextcord.ext import commands
 
-from commissar.bot import APP_NAME
+from commissar.bot import reconciliation
+from commissar.bot.job_runner import Job
+from commissar.bot.mutation_queue import MutationQueue, PRIORITY_REGISTRATION
+from commissar.bot.response import channel_send_multi
+from commissar.bot.reconciliation import MemberRoleChange
 from commissar.bot.localizations import get_localized, ROLE_GRANTED, ROLE_REVOKED
-from commissar.core.data import auth_attempt_repo, character_repo, user_data_repo, server_rule_repo, server_repo
+from commissar.core.data import aio
+from commissar.core.data.membership_index import MembershipIndex
 from commissar.core.esi.esi import ESI
 from commissar import LOGGER, ConfigLoader, DTF
 
@@ -16,49 +22,79 @@ cfg = ConfigLoader().config
 CRON_EXPIRE_AUTH = cfg['auto']['expire_auth']
 CRON_GRANTS = cfg['auto']['grants']
 CRON_UPDATES = cfg['auto']['updates']
+CRON_EVENTS = cfg['auto'].get('events', '* * * * * */5')
 
 
 class AutoCog(commands.Cog):
+    REFRESH_HOT_MINUTES = 60        # characters in corporations used by rules
+    REFRESH_COLD_MINUTES = 6 * 60   # other characters
+    REFRESH_LIMIT = 5000            # max characters per run
+    REJECTED_RETRY_HOURS = 24       # characters rejected by ESI as invalid
+    EVENTS_LIMIT = 100              # max member events per run
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.mutations = MutationQueue(self.reconcile)
+        # guild ID -> notification lines collected during reconciliation pass
+        self.notifications = {}
+        self.flushing = set()
+        # references to running flush tasks, event loop keeps only weak ones
+        self.flush_tasks = set()
+
+        self.jobs = {
+            'expire': Job('expire', self.delete_expired),
+            'updates': Job('updates', self.fetch_and_update_characters_data),
+            'grants': Job('grants', self.grant_revoke_roles),
+            'events': Job('events', self.process_member_events),
+        }
 
         @aiocron.crontab(CRON_EXPIRE_AUTH, start=True)
         async def expire_auth_task():
-            try:
-                await self.delete_expired_auth_attempts()
-            except Exception as e:
-                LOGGER.error(e, exc_info=True)
+            await self.jobs['expire'].run()
 
         @aiocron.crontab(CRON_UPDATES, start=True)
         async def updates_task():
-            try:
-                await self.fetch_and_update_characters_data()
-            except Exception as e:
-                LOGGER.error(e, exc_info=True)
+            await self.jobs['updates'].run()
 
         @aiocron.crontab(CRON_GRANTS, start=True)
         async def grants_task():
-            try:
-                await self.grant_revoke_roles()
-            except Exception as e:
-                LOGGER.error(e, exc_info=True)
+            await self.jobs['grants'].run()
+
+        @aiocron.crontab(CRON_EVENTS, start=True)
+        async def events_task():
+            await self.jobs['events'].run()
 
     @staticmethod
-    async def delete_expired_auth_attempts():
+    async def delete_expired_auth_attempts() -> int:
         start = datetime.now()
-        deleted = auth_attempt_repo.remove_expired()
+        deleted = await aio.auth_attempt_repo.remove_expired()
         LOGGER.info("Deleted auth records: {}".format(deleted))
         elapsed = datetime.now() - start
         LOGGER.info("Elapsed time: {}".format(elapsed))
+        return deleted
 
-    async def fetch_and_update_characters_data(self):
+    @staticmethod
+    async def delete_expired_esi_cache() -> int:
         start = datetime.now()
-        characters = []
-        count = 0
+        deleted = await aio.run(ESI().entity_cache.remove_expired)
+        LOGGER.info("Deleted ESI cache records: {}".format(deleted))
+        elapsed = datetime.now() - start
+        LOGGER.info("Elapsed time: {}".format(elapsed))
+        return deleted
+
+    async def delete_expired(self) -> int:
+        deleted = await aio.member_event_repo.remove_expired()
+        if deleted > 0:
+            LOGGER.warn("Deleted unprocessed member events: {}".format(deleted))
+        return await self.delete_expired_auth_attempts() + await self.delete_expired_esi_cache() + deleted
+
+    async def fetch_and_update_characters_data(self) -> int:
+        start = datetime.now()
+        server_ids = []
+        hot_corporation_ids = set()
         # only connected servers
         for guild in self.bot.guilds:
-            rules = server_rule_repo.find_by_discord_server_id(guild.id)
+            rules = await aio.server_rule_repo.find_by_discord_server_id(guild.id)
             # update character info only if there are at least one valid rule
             if rules is not None and len(rules) > 0:
                 valid = 0
@@ -66,133 +102,171 @@ class AutoCog(commands.Cog):
                     role = guild.get_role(r.discord_role_id)
                     if role is not None:
                         valid += 1
+                        hot_corporation_ids.add(r.corporation_id)
                 if valid > 0:
-                    server_characters = character_repo.find_by_discord_server_id(guild.id)
-                    characters += server_characters
+                    server_ids.append(guild.id)
                 else:
                     LOGGER.warn("No valid rules for server '{}'".format(guild.name))
-        characters_ids = []
+        # only characters due for refresh, limited per run to spread ESI load over time
+        characters = await aio.character_repo.find_due(
+            server_ids, hot_corporation_ids, start,
+            timedelta(minutes=self.REFRESH_HOT_MINUTES), timedelta(minutes=self.REFRESH_COLD_MINUTES),
+            self.REFRESH_LIMIT
+        )
+        # same character can be registered on several servers
         characters_dict = {}
         for c in characters:
-            characters_dict[c.character_id] = c
-            characters_ids.append(c.character_id)
-        results = await ESI().async_get_characters(characters_ids)
-        for character_id, data in results:
-            c = characters_dict[character_id]
-            c.corporation_id = data['corporation_id']
-            c.alliance_id = data['alliance_id'] if 'alliance_id' in data else None
-            count += 1
-        character_repo.save_multiple(characters)
+            characters_dict.setdefault(c.character_id, []).append(c)
+        results, rejected = await ESI().async_get_affiliations(list(characters_dict.keys()))
+        # invalid IDs are retried much later, isolating them again costs ESI error limit budget
+        rejected_ids = [c.id for character_id in rejected for c in characters_dict.get(character_id, [])]
+        if len(rejected_ids) > 0:
+            await aio.character_repo.mark_rejected(
+                rejected_ids, start, start + timedelta(hours=self.REJECTED_RETRY_HOURS)
+            )
+            LOGGER.warn("Characters rejected by ESI: {}".format(len(rejected_ids)))
+        affiliations = {}
+        for data in results:
+            for c in characters_dict.get(data['character_id'], []):
+                affiliations[c.id] = {
+                    "corporation_id": data['corporation_id'],
+                    "alliance_id": data['alliance_id'] if 'alliance_id' in data else None,
+                    "esi_expires": data['expires']
+                }
+        # characters without ESI answer stay due for the next run
+        unanswered = len(characters) - len(affiliations) - len(rejected_ids)
+        if unanswered > 0:
+            LOGGER.warn("No affiliation data for {} characters".format(unanswered))
+        # only characters with changed affiliation are written
+        changed = await aio.character_repo.update_affiliations(list(affiliations.keys()), affiliations, start)
+        count = len(changed)
         elapsed = datetime.now() - start
-        LOGGER.info("Updated characters: {}".format(count))
+        LOGGER.info("Checked characters: {}, changed characters: {}".format(len(affiliations), count))
+        LOGGER.info("ESI error limit: {}".format(ESI().governor.stats()))
         LOGGER.info("Elapsed time: {}".format(elapsed))
+        # roles of affected users are evaluated right away
+        users = {}
+        for c in changed:
+            users.setdefault(c.discord_server_id, set()).add(c.user_data_id)
+        for guild in self.bot.guilds:
+            if guild.id in users:
+                discord_user_ids = set()
+                for user_data_id in users[guild.id]:
+                    discord_user_id = await aio.run(MembershipIndex().discord_user_id, guild.id, user_data_id)
+                    if discord_user_id is not None:
+                        discord_user_ids.add(discord_user_id)
+                await self.reconcile_guild(guild, discord_user_ids)
+        return count
 
-    @staticmethod
-    async def grant(member: nextcord.Member, role: nextcord.Role, channel: nextcord.TextChannel,
-                    locale: nextcord.Locale = Locale.en_US):
-        result = False
+    async def reconcile(self, change: MemberRoleChange) -> bool:
+        member = change.member
+        locale: nextcord.Locale = Locale.en_US
         try:
-            try:
-                await member.add_roles(role, reason=APP_NAME)
-                result = True
-            except nextcord.errors.Forbidden:
-                LOGGER.error("Failed to grant role '{}' to '{}' on server '{}'".format(
-                    role.name, member.name, member.guild.name
-                ))
+            result = await reconciliation.apply(change)
+            if not result:
                 return False
-            if channel is not None:
-                mentions = nextcord.AllowedMentions(everyone=None, users=None, roles=None, replied_user=None)
-                await channel.send(
-                    get_localized(ROLE_GRANTED, locale).format(role.mention, member.mention), allowed_mentions=mentions
-                )
+            if change.channel is not None:
+                lines = self.notifications.setdefault(member.guild.id, [])
+                for role in change.grants:
+                    lines.append(get_localized(ROLE_GRANTED, locale).format(role.mention, member.mention) + "\n")
+                for role in change.revokes:
+                    lines.append(get_localized(ROLE_REVOKED, locale).format(role.mention, member.mention) + "\n")
             else:
                 LOGGER.warn("Server channel for notification is None")
-            LOGGER.info("Role '{}' has been granted to '{}' on server '{}'".format(
-                role.name, member.name, member.guild.name))
+            for role in change.grants:
+                LOGGER.info("Role '{}' has been granted to '{}' on server '{}'".format(
+                    role.name, member.name, member.guild.name))
+            for role in change.revokes:
+                LOGGER.info("Role '{}' has been revoked from '{}' on server '{}'".format(
+                    role.name, member.name, member.guild.name))
+            return True
+        except nextcord.HTTPException as e:
+            # rate limits are handled by mutation queue
+            if e.status == 429:
+                raise e
+            LOGGER.error(e, exc_info=True)
         except Exception as e:
             LOGGER.error(e, exc_info=True)
-        finally:
-            return result
+        return False
 
-    @staticmethod
-    async def revoke(member: nextcord.Member, role: nextcord.Role, channel: nextcord.TextChannel,
-                     locale: nextcord.Locale = Locale.en_US):
-        result = False
+    async def flush_notifications(self, guild_id: int, channel: nextcord.TextChannel):
+        """Sends notifications collected for guild as digest messages once its mutation queue is drained
+        """
         try:
-            try:
-                await member.remove_roles(role, reason=APP_NAME)
-                result = True
-            except nextcord.errors.Forbidden:
-                LOGGER.error("Failed to revoke role '{}' from '{}' on server '{}'".format(
-                    role.name, member.name, member.guild.name
-                ))
-                return False
-            if channel is not None:
-                await channel.send(get_localized(ROLE_REVOKED, locale).format(role.mention, member.mention))
-            else:
-                LOGGER.warn("Server channel for notification is None")
-            LOGGER.info("Role '{}' has been revoked from '{}' on server '{}'".format(
-                role.name, member.name, member.guild.name))
+            await self.mutations.get(guild_id).join()
         except Exception as e:
             LOGGER.error(e, exc_info=True)
         finally:
-            return result
+            lines = self.notifications.pop(guild_id, [])
+            # changes planned while sending are flushed by a new task
+            self.flushing.discard(guild_id)
+        try:
+            if len(lines) > 0:
+                mentions = nextcord.AllowedMentions(everyone=None, users=None, roles=None, replied_user=None)
+                await channel_send_multi(channel, lines, allowed_mentions=mentions)
+        except Exception as e:
+            LOGGER.error(e, exc_info=True)
+
+    async def reconcile_guild(self, guild: nextcord.Guild, discord_user_ids: set[int] = None,
+                              priority: int = None) -> int:
+        """Plans role changes for server members and submits them to mutation queue
+        :param guild: Discord server
+        :param discord_user_ids: limit to these users, all members if None
+        :param priority: queue priority, derived from change if None
+        :return: number of planned changes
+        """
+        server = await aio.server_repo.find(guild.id)
+        if server is None:
+            return 0
+        rules = await aio.server_rule_repo.find_by_discord_server_id(guild.id)
+        if rules is None or len(rules) == 0:
+            LOGGER.debug('No rules')
+            return 0
+        channel = guild.get_channel(server.discord_channel_id)
+        # membership data is (re)loaded and copied outside of event loop
+        snapshot = await aio.run(MembershipIndex().snapshot, guild.id)
+        changes = reconciliation.plan(guild, rules, snapshot, discord_user_ids)
+        for change in changes:
+            change.channel = channel
+            self.mutations.submit(guild.id, change, priority)
+        if channel is not None and len(changes) > 0 and guild.id not in self.flushing:
+            self.flushing.add(guild.id)
+            task = asyncio.create_task(self.flush_notifications(guild.id, channel))
+            self.flush_tasks.add(task)
+            task.add_done_callback(self.flush_tasks.discard)
+        LOGGER.info("Server '{}': Planned changes: {}, Queue: {}".format(
+            guild.name, len(changes), self.mutations.get(guild.id).stats())
+        )
+        return len(changes)
 
-    async def grant_revoke_roles(self):
+    async def grant_revoke_roles(self) -> int:
         start = datetime.now()
+        planned = 0
         # only connected servers
         for guild in self.bot.guilds:
             LOGGER.info("Running for '{}'...".format(guild.name))
-            server = server_repo.find(guild.id)
-            if server is not None:
-                rules = server_rule_repo.find_by_discord_server_id(guild.id)
-                if rules is None or len(rules) == 0:
-                    LOGGER.debug('No rules')
-                    break
-                grants = 0
-                revokes = 0
-                failed = 0
-                for rule in rules:
-                    LOGGER.info("Evaluating '{}' server rule for role '{}'...".format(
-                        server.discord_server_name, rule.discord_role_name
-                    ))
-                    role = guild.get_role(rule.discord_role_id)
-                    # do nothing if role is invalid
-                    if role is None:
-                        LOGGER.debug('No role')
-                        break
-                    channel = guild.get_channel(server.discord_channel_id)
-                    locale: nextcord.Locale = Locale.en_US
-                    for u in user_data_repo.find_by_server_id(guild.id):
-                        member = guild.get_member(u.discord_user_id)
-                        if member is None:
-                            LOGGER.debug("No member '{}' (ID: {}).".format(u.discord_user_name, u.discord_user_id))
-                            break
-                        found = False
-                        for c in u.characters:
-                            LOGGER.info(c.character_name)
-                            if c.corporation_id == rule.corporation_id:
-                                found = True
-                                break
-                        if found:
-                            LOGGER.debug('Found.')
-                            if role not in member.roles:
-                                result = await self.grant(member, role, channel, locale)
-                                if result:
-                                    grants += 1
-                                else:
-                                    failed += 1
-                        else:
-                            LOGGER.debug('Not found.')
-                            if role in member.roles:
-                                result = await self.revoke(member, role, channel, locale)
-                                if result:
-                                    revokes += 1
-                                else:
-                                    failed += 1
-                LOGGER.info("Server '{}': Grants: {}, Revokes: {}, Failed: {}".format(
-                    guild.name, grants, revokes, failed)
-                )
+            planned += await self.reconcile_guild(guild)
         elapsed = datetime.now() - start
         LOGGER.info("Elapsed time: {}".format(elapsed))
+        return planned
 
+    async def process_member_events(self) -> int:
+        """Reconciles members registered through app since last run
+        :return: number of processed events
+        """
+        events = await aio.member_event_repo.find_pending(self.EVENTS_LIMIT)
+        if len(events) == 0:
+            return 0
+        users = {}
+        for e in events:
+            users.setdefault(e.discord_server_id, set()).add(e.discord_user_id)
+        for discord_server_id, discord_user_ids in users.items():
+            guild = self.bot.get_guild(discord_server_id)
+            if guild is None:
+                continue
+            for discord_user_id in discord_user_ids:
+                await aio.run(MembershipIndex().refresh_user, discord_server_id, discord_user_id)
+            await self.reconcile_guild(guild, discord_user_ids, PRIORITY_REGISTRATION)
+        await aio.member_event_repo.remove([e.id for e in events])
+        LOGGER.info("Processed member events: {}".format(len(events)))
+        return len(events)
@@ -8,8 +8,7 @@ from commissar.bot import BotException
 from commissar.bot import ZKILLBOARD_CHARACTER_URL_PATTERN
 from commissar.bot.localizations import *
 from commissar.bot.response import bot_response, bot_response_multi
-from commissar.core.data import AuthAttempt, AUTH_ATTEMPT_TTL_MINUTES, server_repo
-from commissar.core.data import auth_attempt_repo, user_data_repo
+from commissar.core.data import aio, AuthAttempt, AUTH_ATTEMPT_TTL_MINUTES
 from commissar import LOGGER
 from commissar.core.oauth.oauth_service import OAuthService
 
@@ -38,9 +37,11 @@ class PublicCog(commands.Cog):
         try:
             if interaction.guild is None:
                 raise BotException(get_localized(GUILD_ONLY, loc))
-            server_repo.find_or_create(interaction.guild.id, interaction.guild.name)
+            await aio.server_repo.find_or_create(interaction.guild.id, interaction.guild.name)
             auth = OAuthService()
-            info = auth.authorize()
+            info = await auth.async_authorize()
+            if info is None:
+                raise BotException(get_localized(SOMETHING_WENT_WRONG, loc))
             p = AuthAttempt(
                 discord_server_id=interaction.guild.id,
                 discord_user_id=interaction.user.id,
@@ -49,7 +50,7 @@ class PublicCog(commands.Cog):
                 code_verifier=info.code_verifier,
                 locale=interaction.locale.__str__()
             )
-            auth_attempt_repo.save(p)
+            await aio.auth_attempt_repo.save(p)
             # send direct message with link
             await interaction.user.send(get_localized(REGISTER_LINK_TEXT, loc).format(
                 interaction.user.name, interaction.guild.name, auth.HOST, auth.callback_host, AUTH_ATTEMPT_TTL_MINUTES
@@ -75,7 +76,7 @@ class PublicCog(commands.Cog):
         try:
             if interaction.guild is None:
                 raise BotException(get_localized(GUILD_ONLY, loc))
-            u = user_data_repo.find(interaction.guild.id, interaction.user.id)
+            u = await aio.user_data_repo.find(interaction.guild.id, interaction.user.id)
             if u is None:
                 raise BotException(get_localized(USER_NOT_REGISTERED, loc).format(interaction.user.mention))
             # except default permissions
@@ -107,7 +108,7 @@ class PublicCog(commands.Cog):
         try:
             if interaction.guild is None:
                 raise BotException(get_localized(GUILD_ONLY, loc))
-            u = user_data_repo.find(interaction.guild.id, interaction.user.id)
+            u = await aio.user_data_repo.find(interaction.guild.id, interaction.user.id)
             if u is None:
                 raise BotException(get_localized(USER_NOT_REGISTERED, loc).format(interaction.user.mention))
             else:
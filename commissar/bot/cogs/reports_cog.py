@@ -4,13 +4,16 @@ from nextcord.ext import commands
 
 from commissar.bot import BotException
 from commissar.bot.localizations import *
-from commissar.bot.response import bot_response, bot_response_multi
-from commissar.core.data import user_data_repo, server_repo
+from commissar.bot.cogs.ui import PaginatedView
+from commissar.bot.response import bot_response
+from commissar.core.data import aio, stats_service
 from commissar import LOGGER
 
 
 class ReportsCog(commands.Cog):
     MIN_QUERY_LENGTH = 4
+    PAGE_SIZE = 50
+    REGISTERED_PAGE_SIZE = 5
 
     def __init__(self, _bot: commands.Bot):
         self._bot = _bot
@@ -36,19 +39,23 @@ class ReportsCog(commands.Cog):
             if interaction.guild is None:
                 raise BotException(get_localized(GUILD_ONLY, loc))
             # no bots
-            total_users_count = sum([1 if not m.bot else 0 for m in interaction.guild.members])
+            total_users_count = sum(1 for m in interaction.guild.members if not m.bot)
             if total_users_count == 0:
                 raise BotException(get_localized(INVALID_PERMISSIONS_MEMBER_LIST, loc))
-            registered_users_count = 0
-            characters_count = 0
-            users = user_data_repo.find_by_server_id(interaction.guild.id)
-            for u in users:
-                characters_count += len(u.characters)
-                registered_users_count += 1
+            stats = await aio.run(stats_service.server_stats, interaction.guild.id)
+            registered_users_count = stats['users']
             unregistered_users_count = total_users_count - registered_users_count
-            await bot_response(interaction, get_localized(REPORTS_STATS_INFO, loc).format(
-                total_users_count, registered_users_count, unregistered_users_count, characters_count
-            ))
+            message = get_localized(REPORTS_STATS_INFO, loc).format(
+                total_users_count, registered_users_count, unregistered_users_count, stats['characters']
+            )
+            # characters in corporations used by rules
+            rules = await aio.server_rule_repo.find_by_discord_server_id(interaction.guild.id)
+            corporations = {r.corporation_id: r for r in rules}
+            for corporation_id, r in corporations.items():
+                message += get_localized(REPORTS_STATS_CORPORATION, loc).format(
+                    r.corporation_name, r.corporation_ticker, stats['corporations'].get(corporation_id, 0)
+                )
+            await bot_response(interaction, message)
         except BotException as e:
             await bot_response(interaction, e.__str__())
         except BaseException as e:
@@ -64,25 +71,23 @@ class ReportsCog(commands.Cog):
     )
     async def unregistered(self, interaction: nextcord.Interaction):
         loc = interaction.locale
-        messages = []
         try:
             if interaction.guild is None:
                 raise BotException(get_localized(GUILD_ONLY, loc))
-            registered = user_data_repo.find_by_server_id(interaction.guild.id)
-            registered_user_ids = [u.discord_user_id for u in registered]
-            unregistered_users = [m for m in interaction.guild.members if not m.bot and m.id not in registered_user_ids]
-            cnt = len(unregistered_users)
+            registered_user_ids = await aio.user_data_repo.find_discord_user_ids(interaction.guild.id)
+            # set difference instead of a lookup per member
+            unregistered_user_ids = sorted({m.id for m in interaction.guild.members if not m.bot} - registered_user_ids)
+            cnt = len(unregistered_user_ids)
             if cnt == 0:
                 raise BotException(get_localized(NO_UNREGISTERED_USERS_HEADER, loc))
-            messages.append(get_localized(UNREGISTERED_USERS_HEADER, loc).format(cnt))
-            i = 0
-            for u in unregistered_users:
-                messages.append(u.mention)
-                if i != cnt - 1:
-                    messages.append(", ")
-                i += 1
-            # send response with all messages
-            await bot_response_multi(interaction, messages)
+            pages = (cnt + self.PAGE_SIZE - 1) // self.PAGE_SIZE
+
+            async def render(page: int) -> list[str]:
+                ids = unregistered_user_ids[(page - 1) * self.PAGE_SIZE:page * self.PAGE_SIZE]
+                return [get_localized(UNREGISTERED_USERS_HEADER, loc).format(cnt)] + [
+                    "<@{}>\n".format(_id) for _id in ids]
+
+            await PaginatedView(pages, render).send(interaction)
         except BotException as e:
             await bot_response(interaction, e.__str__())
         except BaseException as e:
@@ -98,25 +103,37 @@ class ReportsCog(commands.Cog):
     )
     async def registered(self, interaction: nextcord.Interaction):
         loc = interaction.locale
-        messages = []
         try:
             if interaction.guild is None:
                 raise BotException(get_localized(GUILD_ONLY, loc))
-            registered_users = user_data_repo.find_by_server_id(interaction.guild.id)
-            if registered_users is None or len(registered_users) == 0:
+            guild = interaction.guild
+            cnt = await aio.user_data_repo.count_by_server_id(guild.id)
+            if cnt == 0:
                 raise BotException(get_localized(NO_REGISTERED_USERS, loc))
-            cnt = len(registered_users)
-            messages.append(get_localized(REGISTERED_USERS_HEADER, loc).format(cnt))
-            for u in registered_users:
-                member = interaction.guild.get_member(u.discord_user_id)
-                if member is None:
-                    LOGGER.warn("User '{}' (ID: {}) not found".format(u.discord_user_name, u.discord_user_id))
-                else:
-                    roles = ", ".join([r.mention for r in member.roles if r.name != '@everyone'])
-                    characters = ", ".join([c.character_name for c in u.characters])
-                    messages.append("* {} ({}): {}\n".format(member.mention, roles, characters))
-            # send response with all messages
-            await bot_response_multi(interaction, messages)
+            pages = (cnt + self.REGISTERED_PAGE_SIZE - 1) // self.REGISTERED_PAGE_SIZE
+            # page number -> keyset cursor of visited pages
+            cursors = {1: None}
+
+            async def render(page: int) -> list[str]:
+                if page not in cursors:
+                    cursors[page] = await aio.user_data_repo.find_page_cursor(
+                        guild.id, page, self.REGISTERED_PAGE_SIZE)
+                result = await aio.user_data_repo.find_by_server_id_paginate(
+                    guild.id, after=cursors[page], page=page, per_page=self.REGISTERED_PAGE_SIZE)
+                if result['next'] is not None:
+                    cursors[page + 1] = result['next']
+                messages = [get_localized(REGISTERED_USERS_HEADER, loc).format(cnt)]
+                for u in result['users']:
+                    member = guild.get_member(u.discord_user_id)
+                    if member is None:
+                        LOGGER.warn("User '{}' (ID: {}) not found".format(u.discord_user_name, u.discord_user_id))
+                    else:
+                        roles = ", ".join([r.mention for r in member.roles if r.name != '@everyone'])
+                        characters = ", ".join([c.character_name for c in u.characters])
+                        messages.append("* {} ({}): {}\n".format(member.mention, roles, characters))
+                return messages
+
+            await PaginatedView(pages, render).send(interaction)
         except BotException as e:
             await bot_response(interaction, e.__str__())
         except BaseException as e:
@@ -6,8 +6,7 @@ from commissar.bot.cogs.ui import RuleDropdownView
 from commissar.bot import *
 from commissar.bot.localizations import *
 from commissar.bot.response import bot_response, bot_response_multi
-from commissar.core.data import ServerRule, server_repo
-from commissar.core.data import server_rule_repo
+from commissar.core.data import aio, ServerRule
 from commissar.core.esi.esi import ESI
 from commissar import LOGGER
 
@@ -53,19 +52,21 @@ class RulesCog(commands.Cog, name="Rules"):
         try:
             if interaction.guild is None:
                 raise BotException(get_localized(GUILD_ONLY, loc))
-            server_repo.find_or_create(interaction.guild.id, interaction.guild.name)
+            # ESI call can be slow, respond later
+            await interaction.response.defer(ephemeral=True)
+            await aio.server_repo.find_or_create(interaction.guild.id, interaction.guild.name)
             # check corporation with ESI
-            data = ESI().get_corporation(corporation_id)
+            data = await ESI().async_get_corporation(corporation_id)
             if data is None:
                 raise BotException(get_localized(CORP_NOT_FOUND, loc).format(corporation_id))
-            r = server_rule_repo.find_by_server_id_and_role_id(interaction.guild.id, role.id)
+            r = await aio.server_rule_repo.find_by_server_id_and_role_id(interaction.guild.id, role.id)
             if r is not None:
                 if r.corporation_id == corporation_id:
                     raise BotException(get_localized(SERVER_RULE_EXISTS, loc))
-                r.corporation_id = corporation_id,
-                r.corporation_name = data['name'],
+                r.corporation_id = corporation_id
+                r.corporation_name = data['name']
                 r.corporation_ticker = data['ticker']
-                server_rule_repo.save(r)
+                await aio.server_rule_repo.save(r)
                 await bot_response(interaction, get_localized(SERVER_RULE_UPDATED, loc))
             else:
                 r = ServerRule(
@@ -76,7 +77,7 @@ class RulesCog(commands.Cog, name="Rules"):
                     corporation_name=data['name'],
                     corporation_ticker=data['ticker']
                 )
-                server_rule_repo.save(r)
+                await aio.server_rule_repo.save(r)
                 _link = ZKILLBOARD_CORPORATION_URL_PATTERN.format(r.corporation_id)
                 await bot_response(interaction, get_localized(SERVER_RULE_CREATED, loc).format(
                         interaction.guild.name, role.mention, data['name'], data['ticker'], _link
@@ -103,7 +104,7 @@ class RulesCog(commands.Cog, name="Rules"):
         try:
             if interaction.guild is None:
                 raise BotException(get_localized(GUILD_ONLY, loc))
-            rules = server_rule_repo.find_by_discord_server_id(interaction.guild.id)
+            rules = await aio.server_rule_repo.find_by_discord_server_id(interaction.guild.id)
             if rules is None or len(rules) == 0:
                 raise BotException(get_localized(SERVER_RULE_NOT_FOUND, loc).format(interaction.guild.name))
             await interaction.send(
@@ -127,7 +128,7 @@ class RulesCog(commands.Cog, name="Rules"):
         try:
             if interaction.guild is None:
                 raise BotException(get_localized(GUILD_ONLY, loc))
-            rules = server_rule_repo.find_by_discord_server_id(interaction.guild.id)
+            rules = await aio.server_rule_repo.find_by_discord_server_id(interaction.guild.id)
             if rules is None or len(rules) == 0:
                 raise BotException(get_localized(SERVER_RULES_NOT_FOUND, loc).format(interaction.guild.name))
             messages.append(get_localized(SERVER_RULES_INFO_HEADER, loc).format(interaction.guild.name))
@@ -1,8 +1,12 @@
+from typing import Awaitable, Callable
+
 import nextcord
 from nextcord import ButtonStyle
 
-from commissar.bot.localizations import get_localized, USER_CHARACTER_REMOVED, SOMETHING_WENT_WRONG, SERVER_RULE_REMOVED
-from commissar.core.data import character_repo, Character, ServerRule, server_rule_repo
+from commissar.bot.localizations import get_localized, USER_CHARACTER_REMOVED, SOMETHING_WENT_WRONG, SERVER_RULE_REMOVED, \
+    REPORT_LINES_OMITTED
+from commissar.bot.response import fit_message
+from commissar.core.data import aio, Character, ServerRule
 from commissar import LOGGER
 
 
@@ -31,9 +35,9 @@ class CharacterDropdownView(nextcord.ui.View):
         loc = interaction.locale
         try:
             character_id = self.dropdown.selected
-            c = character_repo.find_by_character_id(character_id)
+            c = await aio.character_repo.find_by_character_id(character_id)
             loc = interaction.locale
-            character_repo.remove(c)
+            await aio.character_repo.remove(c)
             await interaction.response.send_message(get_localized(USER_CHARACTER_REMOVED, loc).format(
                 c.character_name, interaction.user.mention), ephemeral=True)
         except Exception as e:
@@ -71,8 +75,8 @@ class RuleDropdownView(nextcord.ui.View):
         loc = interaction.locale
         try:
             rule_id = self.dropdown.selected
-            r = server_rule_repo.find_by_id(rule_id)
-            server_rule_repo.remove(r)
+            r = await aio.server_rule_repo.find_by_id(rule_id)
+            await aio.server_rule_repo.remove(r)
             await interaction.response.send_message(get_localized(SERVER_RULE_REMOVED, loc), ephemeral=True)
         except Exception as e:
             LOGGER.error(e, exc_info=True)
@@ -89,3 +93,78 @@ class RuleDropdownView(nextcord.ui.View):
         self.dropdown = RuleDropdown(rules)
         self.add_item(self.dropdown)
 
+
+class JumpModal(nextcord.ui.Modal):
+    TITLE = "Jump to page"
+
+    def __init__(self, view: 'PaginatedView'):
+        super().__init__(title=JumpModal.TITLE)
+        self.view = view
+        self.page = nextcord.ui.TextInput(
+            label="Page (1-{})".format(view.pages), min_length=1, max_length=len(str(view.pages)), required=True
+        )
+        self.add_item(self.page)
+
+    async def callback(self, interaction: nextcord.Interaction):
+        try:
+            page = int(self.page.value)
+        except ValueError:
+            page = self.view.page
+        await self.view.show_page(interaction, page)
+
+
+class PaginatedView(nextcord.ui.View):
+    """Report split into pages, a page is rendered only when it is shown
+    """
+    TIMEOUT = 5 * 60
+
+    @nextcord.ui.button(label="Prev", style=nextcord.ButtonStyle.grey, emoji='◀', row=1)
+    async def prev(self, button: nextcord.ui.Button, interaction: nextcord.Interaction):
+        await self.show_page(interaction, self.page - 1)
+
+    @nextcord.ui.button(label="1/1", style=nextcord.ButtonStyle.grey, disabled=True, row=1)
+    async def position(self, button: nextcord.ui.Button, interaction: nextcord.Interaction):
+        pass
+
+    @nextcord.ui.button(label="Next", style=nextcord.ButtonStyle.grey, emoji='▶', row=1)
+    async def next(self, button: nextcord.ui.Button, interaction: nextcord.Interaction):
+        await self.show_page(interaction, self.page + 1)
+
+    @nextcord.ui.button(label="Jump", style=nextcord.ButtonStyle.grey, emoji='🔢', row=1)
+    async def jump(self, button: nextcord.ui.Button, interaction: nextcord.Interaction):
+        await interaction.response.send_modal(JumpModal(self))
+
+    def __init__(self, pages: int, render: Callable[[int], Awaitable[list[str]]]):
+        """
+        :param pages: number of pages
+        :param render: coroutine function rendering page lines by page number starting with 1,
+        lines exceeding message length limit are omitted with a visible note
+        """
+        super().__init__(timeout=PaginatedView.TIMEOUT)
+        self.pages = max(pages, 1)
+        self.page = 1
+        self.render = render
+
+    def __update_buttons(self):
+        self.prev.disabled = self.page <= 1
+        self.next.disabled = self.page >= self.pages
+        self.jump.disabled = self.pages <= 2
+        self.position.label = "{}/{}".format(self.page, self.pages)
+
+    async def send(self, interaction: nextcord.Interaction):
+        """Sends first page as a response to interaction
+        """
+        self.__update_buttons()
+        content = fit_message(await self.render(self.page), get_localized(REPORT_LINES_OMITTED, interaction.locale))
+        await interaction.send(content, view=self, ephemeral=True)
+
+    async def show_page(self, interaction: nextcord.Interaction, page: int):
+        loc = interaction.locale
+        try:
+            self.page = min(max(page, 1), self.pages)
+            self.__update_buttons()
+            content = fit_message(await self.render(self.page), get_localized(REPORT_LINES_OMITTED, loc))
+            await interaction.response.edit_message(content=content, view=self)
+        except Exception as e:
+            LOGGER.error(e, exc_info=True)
+            await interaction.response.send_message(get_localized(SOMETHING_WENT_WRONG, loc), ephemeral=True)
@@ -0,0 +1,75 @@
+"""Runner for periodic jobs which prevents overlapping runs and tracks run statistics
+"""
+import time
+from datetime import datetime
+from typing import Awaitable, Callable
+
+from commissar import LOGGER, DTF
+
+
+class Job:
+    """Periodic job. Ticks are skipped while previous run is in progress or when starting a new run
+    would exceed MAX_DUTY_CYCLE share of time spent running the job.
+    """
+
+    MAX_DUTY_CYCLE = 0.8
+
+    def __init__(self, name: str, func: Callable[[], Awaitable[int]]):
+        self.name = name
+        self.func = func
+        self.running = False
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.items = None
+        self.duration = 0.0
+        self.last_start = None
+        self.last_success: datetime = None
+        self.__last_start_monotonic = None
+
+    def min_interval(self) -> float:
+        """Minimal number of seconds between run starts, adapted to last run duration
+        """
+        return self.duration / Job.MAX_DUTY_CYCLE
+
+    def is_due(self) -> bool:
+        if self.running:
+            return False
+        if self.__last_start_monotonic is None:
+            return True
+        return time.monotonic() - self.__last_start_monotonic >= self.min_interval()
+
+    async def run(self) -> None:
+        if not self.is_due():
+            self.skipped += 1
+            LOGGER.debug("Job '{}' skipped: running={}, last duration={:.1f}s".format(
+                self.name, self.running, self.duration))
+            return
+        self.running = True
+        self.last_start = datetime.now()
+        self.__last_start_monotonic = time.monotonic()
+        failed = False
+        try:
+            self.items = await self.func()
+            self.last_success = datetime.now()
+        except Exception as e:
+            self.failures += 1
+            failed = True
+            LOGGER.error(e, exc_info=True)
+        finally:
+            self.duration = time.monotonic() - self.__last_start_monotonic
+            self.runs += 1
+            self.running = False
+            # frequent idle runs are logged at debug level only
+            log = LOGGER.info if failed or self.items else LOGGER.debug
+            log("Job '{}': {}".format(self.name, self.stats()))
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "failures": self.failures,
+            "items": self.items,
+            "duration": round(self.duration, 3),
+            "last_success": self.last_success.strftime(DTF) if self.last_success else None
+        }
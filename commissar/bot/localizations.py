@@ -123,6 +123,16 @@ REPORTS_STATS_INFO = {
                          "* Всего персонажей: {}"
 }
 
+REPORT_LINES_OMITTED = {
+    Locale.en_US.__str__(): "*… {} more not shown on this page*",
+    Locale.ru.__str__(): "*… ещё {} не показано на этой странице*"
+}
+
+REPORTS_STATS_CORPORATION = {
+    Locale.en_US.__str__(): "\n* {} [{}]: {} characters",
+    Locale.ru.__str__(): "\n* {} [{}]: {} персонажей"
+}
+
 """Registration related messages
 """
 
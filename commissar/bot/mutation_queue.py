@@ -0,0 +1,113 @@
+"""Per guild queue for Discord member mutations with priorities, bounded concurrency and coalescing
+"""
+import asyncio
+import itertools
+from typing import Awaitable, Callable
+
+import nextcord
+
+from commissar import LOGGER
+from commissar.bot.reconciliation import MemberRoleChange
+
+PRIORITY_REGISTRATION = 0
+PRIORITY_GRANT = 1
+PRIORITY_REVOKE = 2
+
+
+class GuildMutationQueue:
+    """Queue of pending member changes for a single guild.
+    Only the latest change for a member is kept, it is processed with the best priority it was submitted with.
+    """
+
+    def __init__(self, guild_id: int, handler: Callable[[MemberRoleChange], Awaitable[bool]], workers: int):
+        self.guild_id = guild_id
+        self.handler = handler
+        self.queue = asyncio.PriorityQueue()
+        # member ID -> (priority, sequence, change)
+        self.pending = {}
+        self.sequence = itertools.count()
+        self.processed = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.tasks = [asyncio.create_task(self.__worker()) for _ in range(workers)]
+
+    def submit(self, change: MemberRoleChange, priority: int) -> None:
+        member_id = change.member.id
+        entry = self.pending.get(member_id)
+        if entry is not None:
+            self.coalesced += 1
+            if entry[0] <= priority:
+                # keep queue position, replace change with the latest one
+                self.pending[member_id] = (entry[0], entry[1], change)
+                return
+        seq = next(self.sequence)
+        self.pending[member_id] = (priority, seq, change)
+        self.queue.put_nowait((priority, seq, member_id))
+
+    def __len__(self):
+        return len(self.pending)
+
+    async def join(self) -> None:
+        """Waits until all submitted changes are processed
+        """
+        await self.queue.join()
+
+    async def __worker(self):
+        while True:
+            priority, seq, member_id = await self.queue.get()
+            try:
+                entry = self.pending.get(member_id)
+                # skip entries superseded by higher priority submissions
+                if entry is None or entry[1] != seq:
+                    continue
+                del self.pending[member_id]
+                change = entry[2]
+                try:
+                    if await self.handler(change):
+                        self.processed += 1
+                    else:
+                        self.failed += 1
+                except nextcord.HTTPException as e:
+                    if e.status != 429:
+                        raise e
+                    retry_after = float(e.response.headers.get('Retry-After', 1))
+                    LOGGER.warn("Rate limited on server (ID: {}), retry after {}s".format(self.guild_id, retry_after))
+                    await asyncio.sleep(retry_after)
+                    if member_id not in self.pending:
+                        self.submit(change, priority)
+            except Exception as e:
+                self.failed += 1
+                LOGGER.error(e, exc_info=True)
+            finally:
+                self.queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.pending),
+            "processed": self.processed,
+            "failed": self.failed,
+            "coalesced": self.coalesced
+        }
+
+
+class MutationQueue:
+    """Registry of per guild mutation queues
+    """
+
+    WORKERS_PER_GUILD = 2
+
+    def __init__(self, handler: Callable[[MemberRoleChange], Awaitable[bool]]):
+        self.handler = handler
+        self.guilds = {}
+
+    def get(self, guild_id: int) -> GuildMutationQueue:
+        q = self.guilds.get(guild_id)
+        if q is None:
+            q = GuildMutationQueue(guild_id, self.handler, MutationQueue.WORKERS_PER_GUILD)
+            self.guilds[guild_id] = q
+        return q
+
+    def submit(self, guild_id: int, change: MemberRoleChange, priority: int = None) -> None:
+        if priority is None:
+            priority = PRIORITY_GRANT if len(change.grants) > 0 else PRIORITY_REVOKE
+        self.get(guild_id).submit(change, priority)
@@ -0,0 +1,93 @@
+"""Role reconciliation: compares expected roles from server rules with actual member roles
+and plans minimal per member changes
+"""
+import nextcord
+
+from commissar.bot import APP_NAME
+from commissar.core.data import ServerRule
+from commissar.core.data.membership_index import MembershipSnapshot
+from commissar import LOGGER
+
+
+class MemberRoleChange:
+    """Planned role changes for a single member
+    """
+
+    def __init__(self, member: nextcord.Member):
+        self.member = member
+        self.grants: list[nextcord.Role] = []
+        self.revokes: list[nextcord.Role] = []
+        # notification channel
+        self.channel: nextcord.TextChannel = None
+
+    def roles(self) -> list[nextcord.Role]:
+        """Resulting member roles after change is applied
+        """
+        revoked = {r.id for r in self.revokes}
+        roles = [r for r in self.member.roles if not r.is_default() and r.id not in revoked]
+        return roles + [r for r in self.grants if r not in roles]
+
+    def __repr__(self):
+        return "MemberRoleChange(member='{}' grants={} revokes={})".format(
+            self.member.id, [r.id for r in self.grants], [r.id for r in self.revokes])
+
+
+def plan(guild: nextcord.Guild, rules: list[ServerRule], snapshot: MembershipSnapshot,
+         discord_user_ids: set[int] = None) -> list[MemberRoleChange]:
+    """Builds change plan for guild members
+    :param guild: Discord server
+    :param rules: server rules
+    :param snapshot: membership index data of the server
+    :param discord_user_ids: limit plan to these users, all members if None
+    :return: list of changes, one per member with at least one role to grant or revoke
+    """
+    registered = snapshot.registered
+    changes = {}
+
+    def change_for(discord_user_id: int) -> MemberRoleChange:
+        c = changes.get(discord_user_id)
+        if c is None:
+            member = guild.get_member(discord_user_id)
+            if member is None:
+                LOGGER.debug("No member (ID: {}).".format(discord_user_id))
+                return None
+            c = MemberRoleChange(member)
+            changes[discord_user_id] = c
+        return c
+
+    for rule in rules:
+        role = guild.get_role(rule.discord_role_id)
+        # do nothing if role is invalid
+        if role is None:
+            LOGGER.debug("No role '{}' (ID: {})".format(rule.discord_role_name, rule.discord_role_id))
+            continue
+        expected = snapshot.members(rule.corporation_id)
+        current = {m.id for m in role.members}
+        if discord_user_ids is not None:
+            expected = expected & discord_user_ids
+            current = current & discord_user_ids
+        for discord_user_id in expected - current:
+            c = change_for(discord_user_id)
+            if c is not None:
+                c.grants.append(role)
+        # roles are revoked only from registered users
+        for discord_user_id in (current & registered) - expected:
+            c = change_for(discord_user_id)
+            if c is not None:
+                c.revokes.append(role)
+    return list(changes.values())
+
+
+async def apply(change: MemberRoleChange) -> bool:
+    """Applies all role changes of a member with a single API request
+    :param change: planned change
+    :return: True if successful
+    """
+    try:
+        await change.member.edit(roles=change.roles(), reason=APP_NAME)
+        return True
+    except nextcord.errors.Forbidden:
+        LOGGER.error("Failed to update roles of '{}' on server '{}'".format(
+            change.member.name, change.member.guild.name
+        ))
+        return False
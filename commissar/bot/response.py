@@ -1,13 +1,12 @@
 import nextcord
 
-
-async def bot_response(interaction: nextcord.Interaction, message: str, ephemeral=True):
-    await interaction.response.send_message(message, ephemeral=ephemeral)
+MESSAGE_LIMIT = 2000
 
 
-async def bot_response_multi(interaction: nextcord.Interaction, messages: list[str], ephemeral=True):
+def chunk_messages(messages: list[str], limit: int = MESSAGE_LIMIT) -> list[str]:
+    """Joins messages into as few chunks as possible not exceeding Discord message length limit
+    """
     current = 0
-    limit = 2000
     buffer = ""
     chunks = []
     for message in messages:
@@ -16,10 +15,48 @@ async def bot_response_multi(interaction: nextcord.Interaction, messages: list[s
             buffer += message
             current = new
         else:
-            chunks.append(buffer)
+            if len(buffer) > 0:
+                chunks.append(buffer)
             buffer = message
             current = len(message)
     chunks.append(buffer)
-    for chunk in chunks:
+    return chunks
+
+
+def fit_message(lines: list[str], marker: str, limit: int = MESSAGE_LIMIT) -> str:
+    """Joins lines into a single message not exceeding Discord message length limit.
+    Lines which do not fit are omitted and reported with marker, overly long lines are shortened.
+    :param lines: message lines, first one is a header
+    :param marker: text reporting omitted lines, formatted with number of omitted lines
+    :param limit: message length limit
+    """
+    line_limit = limit // 4
+    lines = [line if len(line) <= line_limit else line[:line_limit - 2] + "…\n" for line in lines]
+    if sum(len(line) for line in lines) <= limit:
+        return "".join(lines)
+    available = limit - len(marker.format(len(lines)))
+    message = ""
+    for i, line in enumerate(lines):
+        if len(message) + len(line) > available:
+            return message + marker.format(len(lines) - i)
+        message += line
+    return message
+
+
+async def bot_response(interaction: nextcord.Interaction, message: str, ephemeral=True):
+    # deferred interactions are answered with followup message
+    if interaction.response.is_done():
+        await interaction.followup.send(message, ephemeral=ephemeral)
+    else:
+        await interaction.response.send_message(message, ephemeral=ephemeral)
+
+
+async def bot_response_multi(interaction: nextcord.Interaction, messages: list[str], ephemeral=True):
+    for chunk in chunk_messages(messages):
         await interaction.send(chunk, ephemeral=ephemeral)
 
+
+async def channel_send_multi(channel: nextcord.TextChannel, messages: list[str],
+                             allowed_mentions: nextcord.AllowedMentions = None):
+    for chunk in chunk_messages(messages):
+        await channel.send(chunk, allowed_mentions=allowed_mentions)
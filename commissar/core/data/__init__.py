@@ -2,12 +2,12 @@ import os
 from contextlib import contextmanager
 from datetime import datetime, timedelta
 
-from sqlalchemy import Column, Integer, DateTime, String, BigInteger, ForeignKey, UniqueConstraint
-from sqlalchemy import create_engine
+from sqlalchemy import Column, Integer, DateTime, String, BigInteger, ForeignKey, UniqueConstraint, JSON, Index
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import relationship, DeclarativeBase
 from sqlalchemy.orm import sessionmaker
 
-from commissar import ConfigLoader
+from commissar import ConfigLoader, LOGGER
 
 cl = ConfigLoader()
 url = os.environ["db_string"]
@@ -29,8 +29,10 @@ CORP_NAME_LEN = 50              # EVE Online limit
 CORP_TICKER_LEN = 5             # EVE Online limit
 CHAR_NAME_LEN = 37              # EVE Online limit
 LOCALE_LEN = 5                  # Discord limit
+ESI_ENTITY_KIND_LEN = 20        #
 
 AUTH_ATTEMPT_TTL_MINUTES = 60
+MEMBER_EVENT_TTL_MINUTES = 60
 
 
 class Server(Base):
@@ -87,6 +89,9 @@ class AuthAttempt(Base):
     expire = Column(DateTime(), default=datetime.now() + timedelta(minutes=AUTH_ATTEMPT_TTL_MINUTES))
 
     __tablename__ = 'auth'
+    __table_args__ = (
+        Index('auth_expire_idx', 'expire'),
+    )
 
     def __repr__(self):
         return "AuthAttempt(state='{}' created='{}')".format(self.state, self.created)
@@ -127,18 +132,62 @@ class Character(Base):
     alliance_id = Column(BigInteger(), nullable=True)
     created = Column(DateTime(), default=datetime.now)
     updated = Column(DateTime(), default=None, onupdate=datetime.now)
+    last_checked = Column(DateTime(), nullable=True)    # last affiliation check with ESI
+    esi_expires = Column(DateTime(), nullable=True)     # ESI cache expiry of last affiliation check
 
     user_data = relationship("UserData", back_populates="characters")
 
     __tablename__ = 'characters'
     __table_args__ = (
+        # also serves filters by discord_server_id only
         UniqueConstraint('discord_server_id', 'character_id', name='character_unq'),
+        Index('character_character_id_idx', 'character_id'),
+        Index('character_user_data_idx', 'user_data_id'),
+        Index('character_server_corporation_idx', 'discord_server_id', 'corporation_id'),
+        Index('character_last_checked_idx', 'last_checked'),
     )
 
     def __repr__(self):
         return "Character(id='{}' name='{}')".format(self.character_id, self.character_name)
 
 
+class EsiCacheEntry(Base):
+    """Database entity to hold ESI entity payloads (characters, corporations, alliances) shared by bot and app
+    """
+
+    kind = Column(String(ESI_ENTITY_KIND_LEN), primary_key=True)
+    entity_id = Column(BigInteger(), primary_key=True)
+    payload = Column(JSON(), nullable=False)
+    expires = Column(DateTime(), nullable=False)    # UTC
+    updated = Column(DateTime(), default=datetime.now, onupdate=datetime.now)
+
+    __tablename__ = 'esi_cache'
+    __table_args__ = (
+        Index('esi_cache_expires_idx', 'expires'),
+    )
+
+    def __repr__(self):
+        return "EsiCacheEntry(kind='{}' id='{}' expires='{}')".format(self.kind, self.entity_id, self.expires)
+
+
+class MemberEvent(Base):
+    """Database entity to hold member change notifications sent by app to bot (outbox)
+    """
+
+    id = Column(Integer(), primary_key=True)
+    discord_server_id = Column(BigInteger(), nullable=False)
+    discord_user_id = Column(BigInteger(), nullable=False)
+    created = Column(DateTime(), default=datetime.now)
+
+    __tablename__ = 'member_event'
+    __table_args__ = (
+        Index('member_event_created_idx', 'created'),
+    )
+
+    def __repr__(self):
+        return "MemberEvent(id='{}' server='{}' user='{}')".format(self.id, self.discord_server_id, self.discord_user_id)
+
+
 @contextmanager
 def get_session():
     session = session_generator()
@@ -148,5 +197,65 @@ def get_session():
         session.close()
 
 
+def add_missing_columns() -> None:
+    """Simple migration: adds nullable columns declared on entities but missing in existing tables.
+    Each column is added in its own transaction, a column created concurrently by another process is ignored.
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                LOGGER.error("Column '{}.{}' is NOT NULL and can not be added automatically".format(
+                    table.name, column.name))
+                continue
+            try:
+                with engine.begin() as connection:
+                    connection.execute(text("ALTER TABLE {} ADD COLUMN {} {}".format(
+                        table.name, column.name, column.type.compile(dialect=engine.dialect)
+                    )))
+            except Exception as e:
+                LOGGER.warn("Column '{}.{}' not added: {}".format(table.name, column.name, e))
+
+
+def add_missing_indexes() -> None:
+    """Simple migration: creates indexes declared on entities but missing in existing tables.
+    Each index is created in its own transaction, an index created concurrently by another process is ignored.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                with engine.begin() as connection:
+                    index.create(connection, checkfirst=True)
+            except Exception as e:
+                LOGGER.warn("Index '{}' not created: {}".format(index.name, e))
+
+
+def add_trigram_index() -> bool:
+    """Creates pg_trgm GIN index for character name substring search (PostgreSQL only)
+    :return: True if index is available
+    """
+    if engine.dialect.name != 'postgresql':
+        return False
+    try:
+        with engine.begin() as connection:
+            connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            connection.execute(text(
+                "CREATE INDEX IF NOT EXISTS character_name_trgm_idx ON characters "
+                "USING gin (character_name gin_trgm_ops)"
+            ))
+        return True
+    except Exception as e:
+        LOGGER.warn("pg_trgm is not available, falling back to in-memory name index: {}".format(e))
+        return False
+
+
 # initialize database tables
 Base.metadata.create_all(engine)
+add_missing_columns()
+add_missing_indexes()
+TRIGRAM_SEARCH = add_trigram_index()
@@ -0,0 +1,53 @@
+"""Asynchronous facade for repositories. Blocking repository calls are run in a thread pool,
+so database queries don't block the event loop
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from commissar.core.data import auth_attempt_repo as _auth_attempt_repo
+from commissar.core.data import character_repo as _character_repo
+from commissar.core.data import esi_cache_repo as _esi_cache_repo
+from commissar.core.data import member_event_repo as _member_event_repo
+from commissar.core.data import server_repo as _server_repo
+from commissar.core.data import server_rule_repo as _server_rule_repo
+from commissar.core.data import user_data_repo as _user_data_repo
+
+MAX_WORKERS = 8
+EXECUTOR = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='db')
+
+
+async def run(func, *args, **kwargs):
+    """Runs blocking function in database thread pool
+    :param func: blocking function
+    :return: function result
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(EXECUTOR, functools.partial(func, *args, **kwargs))
+
+
+class AsyncRepo:
+    """Wraps repository module functions into coroutines running in database thread pool
+    """
+
+    def __init__(self, repo):
+        self._repo = repo
+
+    def __getattr__(self, name):
+        func = getattr(self._repo, name)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await run(func, *args, **kwargs)
+
+        setattr(self, name, wrapper)
+        return wrapper
+
+
+auth_attempt_repo = AsyncRepo(_auth_attempt_repo)
+character_repo = AsyncRepo(_character_repo)
+esi_cache_repo = AsyncRepo(_esi_cache_repo)
+member_event_repo = AsyncRepo(_member_event_repo)
+server_repo = AsyncRepo(_server_repo)
+server_rule_repo = AsyncRepo(_server_rule_repo)
+user_data_repo = AsyncRepo(_user_data_repo)
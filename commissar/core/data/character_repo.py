@@ -2,7 +2,17 @@
 """Functions repository for Character
 """
 
-from commissar.core.data import get_session, Character
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, and_, update, func
+from sqlalchemy.orm import joinedload
+
+from commissar.core.data import get_session, Character, TRIGRAM_SEARCH
+from commissar.core.data.membership_index import MembershipIndex
+from commissar.core.data.name_index import NameIndex
+
+UPDATE_CHUNK_SIZE = 1000
+SEARCH_LIMIT = 25
 
 
 def save(c: Character) -> None:
@@ -10,6 +20,8 @@ def save(c: Character) -> None:
         session.add(c)
         session.commit()
         session.refresh(c)
+    MembershipIndex().on_character_saved(c)
+    NameIndex().on_character_saved(c)
 
 
 def find(_id: int) -> Character:
@@ -27,31 +39,164 @@ def find_all() -> list[Character]:
         return session.query(Character).all()
 
 
-def find_by_name(discord_server_id: int, character_name: str) -> list[Character]:
+def find_by_name(discord_server_id: int, character_name: str, limit: int = SEARCH_LIMIT) -> list[Character]:
+    """Case-insensitive substring search of characters by name, best matches first.
+    Uses pg_trgm index on PostgreSQL, in-memory trigram index otherwise.
+    :param discord_server_id: Discord server ID
+    :param character_name: part of character name
+    :param limit: max number of results
+    :return: list of characters with user data loaded
+    """
     with get_session() as session:
-        exp = '%{}%'.format(character_name)
-        res = (session.query(Character).filter(Character.discord_server_id == discord_server_id)
-               .filter(Character.character_name.like(exp)))
-        return res
+        stmt = session.query(Character).options(joinedload(Character.user_data))
+        if TRIGRAM_SEARCH:
+            exp = '%{}%'.format(character_name.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+            return stmt.filter(
+                Character.discord_server_id == discord_server_id,
+                Character.character_name.ilike(exp, escape='\\')
+            ).order_by(
+                func.similarity(Character.character_name, character_name).desc(), Character.character_name
+            ).limit(limit).all()
+        ids = NameIndex().search(discord_server_id, character_name, limit)
+        if len(ids) == 0:
+            return []
+        found = {c.id: c for c in stmt.filter(Character.id.in_(ids)).all()}
+        return [found[_id] for _id in ids if _id in found]
 
 
 def find_by_discord_server_id(discord_server_id: int) -> list[Character]:
     with get_session() as session:
-        return session.query(Character).filter(Character.discord_server_id == discord_server_id)
+        return session.query(Character).filter(Character.discord_server_id == discord_server_id).all()
 
 
 def find_by_user_data_id(user_data_id: int) -> list[Character]:
     with get_session() as session:
-        return session.query(Character).filter(Character.user_data_id == user_data_id)
+        return session.query(Character).filter(Character.user_data_id == user_data_id).all()
+
+
+def count_by_corporation(discord_server_id: int) -> dict[int, int]:
+    """Number of server characters per corporation
+    :return: corporation ID -> number of characters
+    """
+    with get_session() as session:
+        return {corporation_id: count for corporation_id, count in session.query(
+            Character.corporation_id, func.count(Character.id)).filter(
+            Character.discord_server_id == discord_server_id).group_by(Character.corporation_id)}
+
+
+def find_due(discord_server_ids: list[int], hot_corporation_ids: set[int], now: datetime,
+             hot_interval: timedelta, cold_interval: timedelta, limit: int) -> list[Character]:
+    """Finds characters due for affiliation refresh, least recently checked first.
+    Characters in rule related ('hot') corporations are refreshed with shorter interval.
+    :param discord_server_ids: Discord server IDs
+    :param hot_corporation_ids: corporation IDs used by server rules
+    :param now: current time
+    :param hot_interval: refresh interval for characters in hot corporations
+    :param cold_interval: refresh interval for other characters
+    :param limit: max number of characters
+    :return: list of characters
+    """
+    if len(discord_server_ids) == 0:
+        return []
+    with get_session() as session:
+        return session.query(Character).filter(
+            Character.discord_server_id.in_(discord_server_ids),
+            or_(Character.esi_expires.is_(None), Character.esi_expires <= now),
+            or_(
+                Character.last_checked.is_(None),
+                Character.last_checked <= now - cold_interval,
+                and_(Character.corporation_id.in_(list(hot_corporation_ids)), Character.last_checked <= now - hot_interval)
+            )
+        ).order_by(Character.last_checked.asc().nullsfirst()).limit(limit).all()
 
 
 def save_multiple(characters: list[Character]) -> None:
     with get_session() as session:
         session.bulk_save_objects(characters)
         session.commit()
+    index = MembershipIndex()
+    names = NameIndex()
+    for c in characters:
+        index.on_character_saved(c)
+        names.on_character_saved(c)
+
+
+def update_affiliations(characters_ids: list[int], affiliations: dict[int, dict],
+                        checked_at: datetime) -> list[Character]:
+    """Change detecting bulk update of characters affiliations. Only rows with changed corporation or alliance
+    are updated. Rows answered by ESI (present in affiliations) get 'last_checked' and 'esi_expires' without
+    bumping 'updated', other rows are left untouched.
+    :param characters_ids: checked Character.id values
+    :param affiliations: Character.id -> dict with 'corporation_id', 'alliance_id' and 'esi_expires'
+    :param checked_at: check time
+    :return: changed characters with new affiliation
+    """
+    changed = []
+    with get_session() as session:
+        for i in range(0, len(characters_ids), UPDATE_CHUNK_SIZE):
+            chunk = characters_ids[i:i + UPDATE_CHUNK_SIZE]
+            rows = []
+            expires_groups = {}
+            stored = session.query(
+                Character.id, Character.discord_server_id, Character.user_data_id,
+                Character.corporation_id, Character.alliance_id
+            ).filter(Character.id.in_(chunk))
+            for _id, discord_server_id, user_data_id, corporation_id, alliance_id in stored:
+                a = affiliations.get(_id)
+                # not answered by ESI, stays due for the next check
+                if a is None:
+                    continue
+                expires_groups.setdefault(a['esi_expires'], []).append(_id)
+                if corporation_id != a['corporation_id'] or alliance_id != a['alliance_id']:
+                    rows.append({
+                        "id": _id,
+                        "corporation_id": a['corporation_id'],
+                        "alliance_id": a['alliance_id'],
+                        "updated": checked_at
+                    })
+                    changed.append(Character(
+                        id=_id,
+                        discord_server_id=discord_server_id,
+                        user_data_id=user_data_id,
+                        corporation_id=a['corporation_id'],
+                        alliance_id=a['alliance_id']
+                    ))
+            # single executemany for changed rows
+            if len(rows) > 0:
+                session.execute(update(Character), rows)
+            for esi_expires, ids in expires_groups.items():
+                # setting 'updated' to itself prevents onupdate
+                session.execute(
+                    update(Character).where(Character.id.in_(ids)).values(
+                        last_checked=checked_at, esi_expires=esi_expires, updated=Character.updated
+                    ).execution_options(synchronize_session=False)
+                )
+        session.commit()
+    index = MembershipIndex()
+    for c in changed:
+        index.on_character_saved(c)
+    return changed
+
+
+def mark_rejected(characters_ids: list[int], checked_at: datetime, retry_at: datetime) -> None:
+    """Postpones next check of characters rejected by ESI, without bumping 'updated'
+    :param characters_ids: Character.id values
+    :param checked_at: check time
+    :param retry_at: characters are not due before this time
+    """
+    with get_session() as session:
+        for i in range(0, len(characters_ids), UPDATE_CHUNK_SIZE):
+            session.execute(
+                update(Character).where(Character.id.in_(characters_ids[i:i + UPDATE_CHUNK_SIZE])).values(
+                    last_checked=checked_at, esi_expires=retry_at, updated=Character.updated
+                ).execution_options(synchronize_session=False)
+            )
+        session.commit()
 
 
 def remove(c: Character) -> None:
+    MembershipIndex().on_character_removed(c)
+    NameIndex().on_character_removed(c)
     with get_session() as session:
         session.delete(c)
         session.commit()
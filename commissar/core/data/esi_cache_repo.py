@@ -0,0 +1,32 @@
+"""Functions repository for EsiCacheEntry
+"""
+from datetime import datetime
+
+from commissar.core.data import get_session, EsiCacheEntry
+
+
+def save(e: EsiCacheEntry) -> None:
+    with get_session() as session:
+        session.merge(e)
+        session.commit()
+
+
+def find(kind: str, entity_id: int, now: datetime) -> EsiCacheEntry:
+    with get_session() as session:
+        return session.query(EsiCacheEntry).filter(
+            EsiCacheEntry.kind == kind,
+            EsiCacheEntry.entity_id == entity_id,
+            EsiCacheEntry.expires > now
+        ).first()
+
+
+def find_valid(now: datetime) -> list[EsiCacheEntry]:
+    with get_session() as session:
+        return session.query(EsiCacheEntry).filter(EsiCacheEntry.expires > now).all()
+
+
+def remove_expired(now: datetime) -> int:
+    with get_session() as session:
+        result = session.query(EsiCacheEntry).where(EsiCacheEntry.expires <= now).delete()
+        session.commit()
+        return result
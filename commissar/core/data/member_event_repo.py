@@ -0,0 +1,34 @@
+"""Functions repository for MemberEvent
+"""
+from datetime import datetime, timedelta
+
+from commissar.core.data import get_session, MemberEvent, MEMBER_EVENT_TTL_MINUTES
+
+
+def save(e: MemberEvent) -> None:
+    with get_session() as session:
+        session.add(e)
+        session.commit()
+
+
+def find_pending(limit: int) -> list[MemberEvent]:
+    with get_session() as session:
+        return session.query(MemberEvent).order_by(MemberEvent.id).limit(limit).all()
+
+
+def remove(ids: list[int]) -> int:
+    with get_session() as session:
+        result = session.query(MemberEvent).where(MemberEvent.id.in_(ids)).delete()
+        session.commit()
+        return result
+
+
+def remove_expired() -> int:
+    """Removes events not consumed in time (e.g. bot was offline), periodic reconciliation covers them
+    """
+    with get_session() as session:
+        result = session.query(MemberEvent).where(
+            MemberEvent.created <= datetime.now() - timedelta(minutes=MEMBER_EVENT_TTL_MINUTES)
+        ).delete()
+        session.commit()
+        return result
@@ -0,0 +1,212 @@
+"""In-memory index of server members by corporation used for role evaluation
+"""
+import time
+from threading import Lock
+
+from commissar import SingletonMeta
+from commissar.core.data import get_session, Character, UserData
+
+
+class ServerMembership:
+    """Index data for a single Discord server
+    """
+
+    def __init__(self):
+        self.loaded_at = time.monotonic()
+        # UserData.id -> Discord user ID
+        self.users = {}
+        # Character.id -> (UserData.id, corporation ID)
+        self.characters = {}
+        # corporation ID -> {Discord user ID -> number of characters}
+        self.corporations = {}
+
+    def add_character(self, _id: int, user_data_id: int, corporation_id: int) -> None:
+        self.characters[_id] = (user_data_id, corporation_id)
+        if corporation_id is None:
+            return
+        discord_user_id = self.users[user_data_id]
+        members = self.corporations.setdefault(corporation_id, {})
+        members[discord_user_id] = members.get(discord_user_id, 0) + 1
+
+    def remove_character(self, _id: int) -> None:
+        entry = self.characters.pop(_id, None)
+        if entry is None:
+            return
+        user_data_id, corporation_id = entry
+        if corporation_id is None:
+            return
+        discord_user_id = self.users[user_data_id]
+        members = self.corporations.get(corporation_id, {})
+        count = members.get(discord_user_id, 0) - 1
+        if count > 0:
+            members[discord_user_id] = count
+        else:
+            members.pop(discord_user_id, None)
+            if len(members) == 0:
+                self.corporations.pop(corporation_id, None)
+
+    def save_character(self, _id: int, user_data_id: int, corporation_id: int) -> bool:
+        """
+        :return: False if user is unknown and server data has to be reloaded
+        """
+        if user_data_id not in self.users:
+            return False
+        self.remove_character(_id)
+        self.add_character(_id, user_data_id, corporation_id)
+        return True
+
+    def replace_user(self, user_data_id: int, discord_user_id: int, characters: list[tuple]) -> None:
+        self.users[user_data_id] = discord_user_id
+        for _id in [k for k, (u, _) in self.characters.items() if u == user_data_id]:
+            self.remove_character(_id)
+        for _id, corporation_id in characters:
+            self.add_character(_id, user_data_id, corporation_id)
+
+
+class MembershipSnapshot:
+    """Immutable copy of server index data, safe to use on event loop without locking
+    """
+
+    def __init__(self, s: ServerMembership):
+        self.registered = set(s.users.values())
+        self.corporations = {k: set(v.keys()) for k, v in s.corporations.items()}
+
+    def members(self, corporation_id: int) -> set[int]:
+        return self.corporations.get(corporation_id, set())
+
+
+class MembershipIndex(metaclass=SingletonMeta):
+    """Maps (Discord server ID, corporation ID) to set of registered Discord user IDs.
+    Servers are loaded on first access and updated incrementally by repository functions on changes.
+    Loading queries database without holding the lock, changes made meanwhile are replayed on loaded data.
+    Changes made by other processes are picked up when a server is reloaded after MAX_AGE_SECONDS.
+    """
+
+    MAX_AGE_SECONDS = 10 * 60
+
+    def __init__(self):
+        self._servers = {}
+        # Discord server ID -> list of change lists of loads in progress
+        self._loading = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def __load(discord_server_id: int) -> ServerMembership:
+        s = ServerMembership()
+        with get_session() as session:
+            for _id, discord_user_id in session.query(UserData.id, UserData.discord_user_id).filter(
+                    UserData.discord_server_id == discord_server_id):
+                s.users[_id] = discord_user_id
+            for _id, user_data_id, corporation_id in session.query(
+                    Character.id, Character.user_data_id, Character.corporation_id).filter(
+                    Character.discord_server_id == discord_server_id):
+                if user_data_id in s.users:
+                    s.add_character(_id, user_data_id, corporation_id)
+        return s
+
+    def __get(self, discord_server_id: int) -> ServerMembership:
+        with self._lock:
+            s = self._servers.get(discord_server_id)
+            if s is not None and time.monotonic() - s.loaded_at <= MembershipIndex.MAX_AGE_SECONDS:
+                return s
+            changes = []
+            self._loading.setdefault(discord_server_id, []).append(changes)
+        # database is queried without holding the lock
+        try:
+            s = self.__load(discord_server_id)
+        except BaseException:
+            with self._lock:
+                self.__stop_loading(discord_server_id, changes)
+            raise
+        with self._lock:
+            # changes made while loading are replayed and data installed in the same critical section
+            self.__stop_loading(discord_server_id, changes)
+            if all(change(s) is not False for change in changes):
+                self._servers[discord_server_id] = s
+            else:
+                self._servers.pop(discord_server_id, None)
+            return s
+
+    def __stop_loading(self, discord_server_id: int, changes: list) -> None:
+        """Must be called with lock held
+        """
+        loading = self._loading[discord_server_id]
+        loading.remove(changes)
+        if len(loading) == 0:
+            del self._loading[discord_server_id]
+
+    def __apply(self, discord_server_id: int, change) -> None:
+        """Applies change to loaded server data and to data of loads in progress
+        :param change: function of ServerMembership, returning False means data has to be reloaded
+        """
+        with self._lock:
+            for changes in self._loading.get(discord_server_id, []):
+                changes.append(change)
+            s = self._servers.get(discord_server_id)
+            if s is not None and change(s) is False:
+                # unknown user, server will be reloaded on next access
+                self._servers.pop(discord_server_id, None)
+
+    def snapshot(self, discord_server_id: int) -> MembershipSnapshot:
+        """Copy of server data for role evaluation, loads server if needed
+        """
+        s = self.__get(discord_server_id)
+        with self._lock:
+            return MembershipSnapshot(s)
+
+    def discord_user_id(self, discord_server_id: int, user_data_id: int) -> int:
+        """Discord user ID of a registered user or None
+        """
+        s = self.__get(discord_server_id)
+        with self._lock:
+            return s.users.get(user_data_id)
+
+    def refresh_user(self, discord_server_id: int, discord_user_id: int) -> None:
+        """Reloads a single user of already loaded server, used for changes made by other processes
+        """
+        with self._lock:
+            if discord_server_id not in self._servers and discord_server_id not in self._loading:
+                return
+        with get_session() as session:
+            u = session.query(UserData.id).filter(
+                UserData.discord_server_id == discord_server_id,
+                UserData.discord_user_id == discord_user_id).first()
+            if u is None:
+                return
+            characters = [tuple(c) for c in session.query(
+                Character.id, Character.corporation_id).filter(Character.user_data_id == u.id)]
+        self.__apply(discord_server_id, lambda s: s.replace_user(u.id, discord_user_id, characters))
+
+    def stats(self, discord_server_id: int) -> dict:
+        """Counters of already loaded server, does not load it
+        :return: dict with 'users', 'characters' and 'corporations' (corporation ID -> number of characters)
+        or None if server is not loaded or outdated
+        """
+        with self._lock:
+            s = self._servers.get(discord_server_id)
+            if s is None or time.monotonic() - s.loaded_at > MembershipIndex.MAX_AGE_SECONDS:
+                return None
+            return {
+                "users": len(s.users),
+                "characters": len(s.characters),
+                "corporations": {k: sum(v.values()) for k, v in s.corporations.items()}
+            }
+
+    def invalidate(self, discord_server_id: int = None) -> None:
+        with self._lock:
+            if discord_server_id is None:
+                self._servers.clear()
+            else:
+                self._servers.pop(discord_server_id, None)
+
+    def on_user_saved(self, u: UserData) -> None:
+        _id, discord_user_id = u.id, u.discord_user_id
+        self.__apply(u.discord_server_id, lambda s: s.users.__setitem__(_id, discord_user_id))
+
+    def on_character_saved(self, c: Character) -> None:
+        _id, user_data_id, corporation_id = c.id, c.user_data_id, c.corporation_id
+        self.__apply(c.discord_server_id, lambda s: s.save_character(_id, user_data_id, corporation_id))
+
+    def on_character_removed(self, c: Character) -> None:
+        _id = c.id
+        self.__apply(c.discord_server_id, lambda s: s.remove_character(_id))
@@ -0,0 +1,118 @@
+"""In-memory trigram index of character names, used for substring search on databases without pg_trgm
+"""
+import time
+from threading import Lock
+
+from commissar import SingletonMeta
+from commissar.core.data import get_session, Character
+
+N = 3
+
+
+def ngrams(s: str) -> set[str]:
+    s = s.lower()
+    return {s[i:i + N] for i in range(len(s) - N + 1)}
+
+
+def similarity(a: str, b: str) -> float:
+    """Share of common trigrams, same measure as pg_trgm similarity()
+    """
+    x = ngrams("  {} ".format(a))
+    y = ngrams("  {} ".format(b))
+    if len(x) == 0 or len(y) == 0:
+        return 0.0
+    return len(x & y) / len(x | y)
+
+
+class ServerNames:
+    """Index data for a single Discord server
+    """
+
+    def __init__(self):
+        self.loaded_at = time.monotonic()
+        # Character.id -> lower case name
+        self.names = {}
+        # trigram -> set of Character.id
+        self.postings = {}
+
+    def add(self, _id: int, name: str) -> None:
+        self.remove(_id)
+        self.names[_id] = name.lower()
+        for g in ngrams(name):
+            self.postings.setdefault(g, set()).add(_id)
+
+    def remove(self, _id: int) -> None:
+        name = self.names.pop(_id, None)
+        if name is None:
+            return
+        for g in ngrams(name):
+            ids = self.postings.get(g)
+            if ids is not None:
+                ids.discard(_id)
+                if len(ids) == 0:
+                    del self.postings[g]
+
+
+class NameIndex(metaclass=SingletonMeta):
+    """Maps Discord server ID to trigram index of character names.
+    Servers are loaded on first search and updated incrementally by repository functions on changes.
+    """
+
+    MAX_AGE_SECONDS = 10 * 60
+
+    def __init__(self):
+        self._servers = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def __load(discord_server_id: int) -> ServerNames:
+        s = ServerNames()
+        with get_session() as session:
+            for _id, character_name in session.query(Character.id, Character.character_name).filter(
+                    Character.discord_server_id == discord_server_id):
+                s.add(_id, character_name)
+        return s
+
+    def __get(self, discord_server_id: int) -> ServerNames:
+        with self._lock:
+            s = self._servers.get(discord_server_id)
+            if s is None or time.monotonic() - s.loaded_at > NameIndex.MAX_AGE_SECONDS:
+                s = self.__load(discord_server_id)
+                self._servers[discord_server_id] = s
+            return s
+
+    def search(self, discord_server_id: int, query: str, limit: int) -> list[int]:
+        """Character IDs with names containing query, best matches first
+        :param discord_server_id: Discord server ID
+        :param query: part of character name
+        :param limit: max number of results
+        :return: list of Character.id
+        """
+        s = self.__get(discord_server_id)
+        q = query.lower()
+        with self._lock:
+            grams = ngrams(q)
+            if len(grams) > 0:
+                candidates = None
+                for g in sorted(grams, key=lambda x: len(s.postings.get(x, ()))):
+                    ids = s.postings.get(g, set())
+                    candidates = set(ids) if candidates is None else candidates & ids
+                    if len(candidates) == 0:
+                        break
+            else:
+                candidates = s.names.keys()
+            found = [(_id, s.names[_id]) for _id in candidates if q in s.names[_id]]
+        found.sort(key=lambda x: (-similarity(x[1], q), x[1]))
+        return [_id for _id, _ in found[:limit]]
+
+    def on_character_saved(self, c: Character) -> None:
+        with self._lock:
+            s = self._servers.get(c.discord_server_id)
+            if s is not None:
+                s.add(c.id, c.character_name)
+
+    def on_character_removed(self, c: Character) -> None:
+        with self._lock:
+            s = self._servers.get(c.discord_server_id)
+            if s is not None:
+                s.remove(c.id)
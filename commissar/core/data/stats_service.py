@@ -0,0 +1,21 @@
+"""Registration statistics of Discord servers
+"""
+from commissar.core.data import character_repo, user_data_repo
+from commissar.core.data.membership_index import MembershipIndex
+
+
+def server_stats(discord_server_id: int) -> dict:
+    """Registration statistics. Incrementally maintained membership index counters are used when server is loaded,
+    aggregate queries otherwise.
+    :param discord_server_id: Discord server ID
+    :return: dict with 'users', 'characters' and 'corporations' (corporation ID -> number of characters)
+    """
+    stats = MembershipIndex().stats(discord_server_id)
+    if stats is not None:
+        return stats
+    corporations = character_repo.count_by_corporation(discord_server_id)
+    return {
+        "users": user_data_repo.count_by_server_id(discord_server_id),
+        "characters": sum(corporations.values()),
+        "corporations": {k: v for k, v in corporations.items() if k is not None}
+    }
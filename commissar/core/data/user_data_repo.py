@@ -1,9 +1,21 @@
 """Functions repository for UserData
 """
-from sqlalchemy.orm import joinedload
+import time
+from threading import Lock
+from typing import Iterator
+
+from sqlalchemy.orm import joinedload, selectinload
 
 from commissar import LOGGER
-from commissar.core.data import get_session, UserData
+from commissar.core.data import get_session, UserData, Character
+from commissar.core.data.membership_index import MembershipIndex
+
+PROJECTION_BATCH_SIZE = 1000
+# registrations made by other processes are picked up after COUNT_TTL_SECONDS
+COUNT_TTL_SECONDS = 60
+# Discord server ID -> (number of users, monotonic time)
+_counts = {}
+_counts_lock = Lock()
 
 
 def save(u: UserData) -> None:
@@ -11,6 +23,9 @@ def save(u: UserData) -> None:
         session.add(u)
         session.commit()
         session.refresh(u)
+    MembershipIndex().on_user_saved(u)
+    with _counts_lock:
+        _counts.pop(u.discord_server_id, None)
 
 
 def find(discord_server_id: int, discord_user_id: int) -> UserData:
@@ -27,27 +42,97 @@ def find_by_server_id(discord_server_id: int) -> list[UserData]:
             UserData.discord_server_id == discord_server_id).all()
 
 
-def find_by_server_id_paginate(discord_server_id: int, page: int = 1, per_page: int = 10) -> dict:
+def find_discord_user_ids(discord_server_id: int) -> set[int]:
+    """Discord user IDs of all registered users of server, without loading entities
+    """
+    with get_session() as session:
+        return {discord_user_id for discord_user_id, in session.query(UserData.discord_user_id).filter(
+            UserData.discord_server_id == discord_server_id).yield_per(PROJECTION_BATCH_SIZE)}
+
+
+def count_by_server_id(discord_server_id: int) -> int:
+    """Cached number of registered users of server
+    """
+    with _counts_lock:
+        entry = _counts.get(discord_server_id)
+        if entry is not None and time.monotonic() - entry[1] < COUNT_TTL_SECONDS:
+            return entry[0]
+    with get_session() as session:
+        count = session.query(UserData.id).filter(UserData.discord_server_id == discord_server_id).count()
+    with _counts_lock:
+        _counts[discord_server_id] = (count, time.monotonic())
+    return count
+
+
+def find_page_cursor(discord_server_id: int, page: int, per_page: int = 10) -> int:
+    """Keyset cursor ('after' value) of arbitrary page, used to jump to a page without visiting previous ones
+    :return: UserData.id of the last user before page or None for the first page
+    """
+    if page <= 1:
+        return None
+    with get_session() as session:
+        row = session.query(UserData.id).filter(UserData.discord_server_id == discord_server_id).order_by(
+            UserData.id).offset((page - 1) * per_page - 1).limit(1).first()
+        return row.id if row is not None else None
+
+
+def find_by_server_id_paginate(discord_server_id: int, after: int = None, before: int = None,
+                               page: int = 1, per_page: int = 10) -> dict:
+    """Keyset pagination of server users ordered by UserData.id
+    :param discord_server_id: Discord server ID
+    :param after: UserData.id of the last user on previous page, used to go forward
+    :param before: UserData.id of the first user on next page, used to go back
+    :param page: current page number, for display only
+    :param per_page: number of users per page
+    :return: page data, 'prev' and 'next' are cursors for 'before' and 'after'
+    """
     with get_session() as session:
-        offset = (page-1) * per_page
-        stmt = session.query(UserData).options(joinedload(UserData.characters)).filter(
+        stmt = session.query(UserData).options(selectinload(UserData.characters)).filter(
             UserData.discord_server_id == discord_server_id)
-        count = stmt.count()
-        pages = count // per_page
-        if count % per_page > 0:
-            pages += 1
-        _prev = page - 1 if page > 1 else None
-        _next = page + 1 if page < pages else None
-        LOGGER.info("count={} pages={} prev={} next={}".format(count, pages, _prev, _next))
-        paged_results = stmt.limit(per_page).offset(offset).all()
-        return {
-            "count": count,
-            "pages": pages,
-            "users": paged_results,
-            "current": page,
-            "prev": _prev,
-            "next": _next
-        }
+        if before is not None:
+            users = stmt.filter(UserData.id < before).order_by(UserData.id.desc()).limit(per_page + 1).all()
+            has_prev = len(users) > per_page
+            users = users[:per_page][::-1]
+            has_next = True
+        else:
+            if after is not None:
+                stmt = stmt.filter(UserData.id > after)
+            users = stmt.order_by(UserData.id).limit(per_page + 1).all()
+            has_next = len(users) > per_page
+            users = users[:per_page]
+            has_prev = after is not None
+    count = count_by_server_id(discord_server_id)
+    pages = count // per_page
+    if count % per_page > 0:
+        pages += 1
+    _prev = users[0].id if has_prev and len(users) > 0 else None
+    _next = users[-1].id if has_next and len(users) > 0 else None
+    LOGGER.info("count={} pages={} prev={} next={}".format(count, pages, _prev, _next))
+    return {
+        "count": count,
+        "pages": pages,
+        "users": users,
+        "current": page,
+        "prev": _prev,
+        "next": _next
+    }
+
+
+def stream_by_server_id(discord_server_id: int) -> Iterator[tuple]:
+    """Streams registered users of server with their characters using server-side cursor, one row per character
+    (users without characters have None in character columns)
+    :return: iterator of (discord_user_id, discord_user_name, character_id, character_name, corporation_id,
+    alliance_id) tuples ordered by user
+    """
+    with get_session() as session:
+        rows = session.query(
+            UserData.discord_user_id, UserData.discord_user_name, Character.character_id, Character.character_name,
+            Character.corporation_id, Character.alliance_id
+        ).outerjoin(Character, Character.user_data_id == UserData.id).filter(
+            UserData.discord_server_id == discord_server_id
+        ).order_by(UserData.id, Character.id).yield_per(PROJECTION_BATCH_SIZE)
+        for row in rows:
+            yield tuple(row)
 
 
 def find_all() -> list[UserData]:
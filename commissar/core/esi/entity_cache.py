@@ -0,0 +1,108 @@
+"""Two level (memory and database) cache of ESI entities shared by bot and app processes
+"""
+from datetime import datetime, timezone, timedelta
+from threading import Lock
+
+from httpx import Response
+
+from commissar import LOGGER
+from commissar.core.data import EsiCacheEntry, esi_cache_repo, aio
+from commissar.core.esi.http_client import parse_expires
+
+CHARACTER = 'character'
+CORPORATION = 'corporation'
+ALLIANCE = 'alliance'
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class EntityCache:
+    """Read-through cache of ESI entity payloads with ESI expiry
+    """
+
+    DEFAULT_TTL_SECONDS = 60 * 60
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = Lock()
+
+    def warm(self) -> int:
+        """Loads all valid entries from database
+        :return: number of loaded entries
+        """
+        count = 0
+        try:
+            for e in esi_cache_repo.find_valid(utc_now()):
+                with self._lock:
+                    self._entries[(e.kind, e.entity_id)] = (e.payload, e.expires)
+                count += 1
+            LOGGER.info("ESI cache warmed up with {} entries".format(count))
+        except Exception as e:
+            LOGGER.error(e, exc_info=True)
+        return count
+
+    def __get_memory(self, kind: str, entity_id: int) -> dict:
+        key = (kind, int(entity_id))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            payload, expires = entry
+            if expires > utc_now():
+                return payload
+            self._entries.pop(key, None)
+            return None
+
+    def get(self, kind: str, entity_id: int) -> dict:
+        payload = self.__get_memory(kind, entity_id)
+        if payload is not None:
+            return payload
+        now = utc_now()
+        key = (kind, int(entity_id))
+        # entry can be stored by another process
+        try:
+            e = esi_cache_repo.find(kind, int(entity_id), now)
+        except Exception as ex:
+            LOGGER.error(ex, exc_info=True)
+            return None
+        if e is None:
+            return None
+        with self._lock:
+            self._entries[key] = (e.payload, e.expires)
+        return e.payload
+
+    def put(self, kind: str, entity_id: int, payload: dict, response: Response = None) -> None:
+        expires = parse_expires(response) if response is not None else None
+        if expires is not None:
+            expires = expires.astimezone(timezone.utc).replace(tzinfo=None)
+        else:
+            expires = utc_now() + timedelta(seconds=EntityCache.DEFAULT_TTL_SECONDS)
+        key = (kind, int(entity_id))
+        with self._lock:
+            if key in self._entries and self._entries[key] == (payload, expires):
+                return
+            self._entries[key] = (payload, expires)
+        try:
+            esi_cache_repo.save(EsiCacheEntry(kind=kind, entity_id=int(entity_id), payload=payload, expires=expires))
+        except Exception as e:
+            LOGGER.error(e, exc_info=True)
+
+    async def async_get(self, kind: str, entity_id: int) -> dict:
+        """Non-blocking version of get, database is queried in thread pool on memory miss
+        """
+        payload = self.__get_memory(kind, entity_id)
+        if payload is not None:
+            return payload
+        return await aio.run(self.get, kind, entity_id)
+
+    async def async_put(self, kind: str, entity_id: int, payload: dict, response: Response = None) -> None:
+        await aio.run(self.put, kind, entity_id, payload, response)
+
+    def remove_expired(self) -> int:
+        now = utc_now()
+        with self._lock:
+            for key in [k for k, (_, expires) in self._entries.items() if expires <= now]:
+                del self._entries[key]
+        return esi_cache_repo.remove_expired(now)
@@ -5,15 +5,22 @@ from async_lru import alru_cache
 import httpx
 
 from commissar import SingletonMeta
-from commissar.core.esi.http_client import CustomHTTPClient
+from commissar.core.esi import entity_cache
+from commissar.core.esi.entity_cache import EntityCache
+from commissar.core.esi.governor import ErrorLimitGovernor
+from commissar.core.esi.http_client import CustomHTTPClient, parse_expires
+from commissar.core.esi.single_flight import single_flight
 from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_exception
 
 from commissar import LOGGER
 
+# error limit is tracked per IP, so budget is shared by all ESI calls of the process
+GOVERNOR = ErrorLimitGovernor()
+
 
 class RetryStrategy(retry_if_exception):
     """Retry strategy that retries if the exception is an ``HTTPStatusError`` with
-    specified status codes.
+    specified status codes and ESI error limit budget is not running low.
 
     """
 
@@ -21,7 +28,8 @@ class RetryStrategy(retry_if_exception):
         def is_retryable(exception):
             return (
                 isinstance(exception, httpx.HTTPStatusError) and
-                exception.response.status_code in (408, 429, 502, 503, 504)
+                exception.response.status_code in (408, 429, 502, 503, 504) and
+                not GOVERNOR.is_low()
             )
         super().__init__(predicate=is_retryable)
 
@@ -31,30 +39,34 @@ class ESI(CustomHTTPClient, metaclass=SingletonMeta):
     BASE_URL = 'https://esi.evetech.net/latest'
     RETRIES = 2
     DELAY = 0.5
+    AFFILIATION_CHUNK_SIZE = 1000
 
     def __init__(self):
         self.base_url = ESI.BASE_URL
         self.default_headers = {
             "Accept": "application/json",
-            "Cache-Control": "no-cache",
             'User-Agent': self.USER_AGENT
         }
         self.default_parameters = {'datasource': 'tranquility', 'language': 'en'}
         self.counter = 0
-        super().__init__(self.base_url, self.default_headers)
+        self.governor = GOVERNOR
+        self.entity_cache = EntityCache()
+        super().__init__(self.base_url, self.default_headers, self.governor)
 
     # -----------------------------------------------------------------------------------------------------------------
     # curl - X GET "https://esi.evetech.net/latest/characters/1/?datasource=tranquility"
     # - H "accept: application/json"
-    # - H "Cache-Control: no-cache"
     @retry(retry=RetryStrategy(), stop=stop_after_attempt(RETRIES), wait=wait_fixed(DELAY))
     def get_character(self, character_id):
-        data = None
+        data = self.entity_cache.get(entity_cache.CHARACTER, character_id)
+        if data is not None:
+            return data
         try:
             url = "".join(['/characters/', str(character_id), '/'])
             response = self.get(url, params=self.default_parameters)
             if response.status_code == 200:
                 data = response.json()
+                self.entity_cache.put(entity_cache.CHARACTER, character_id, data, response)
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 404:
                 pass
@@ -63,43 +75,123 @@ class ESI(CustomHTTPClient, metaclass=SingletonMeta):
         return data
 
     @alru_cache(maxsize=500, ttl=15 * 60)
+    @single_flight
     async def async_get_character(self, character_id):
-        data = None
+        data = await self.entity_cache.async_get(entity_cache.CHARACTER, character_id)
+        if data is not None:
+            return character_id, data
         try:
             url = "".join(['/characters/', str(character_id), '/'])
             response = await self.async_get(url, params=self.default_parameters)
             if response.status_code == 200:
                 data = response.json()
+                await self.entity_cache.async_put(entity_cache.CHARACTER, character_id, data, response)
         except httpx.HTTPStatusError as e:
-            if e.response.status_code == 404:
-                pass
+            # only 'not found' is a result, other failures must not be cached
+            if e.response.status_code != 404:
+                raise e
         finally:
             self.counter += 1
         return character_id, data
 
-    async def async_get_characters(self, characters_ids: list[int]):
+    # -----------------------------------------------------------------------------------------------------------------
+    # curl - X POST "https://esi.evetech.net/latest/characters/affiliation/?datasource=tranquility"
+    # - H "accept: application/json"
+    # - H "Content-Type: application/json"
+    # - d "[1, 2, 3]"
+    @retry(retry=RetryStrategy(), stop=stop_after_attempt(RETRIES), wait=wait_fixed(DELAY))
+    async def async_get_affiliations_chunk(self, characters_ids: list[int]) -> list[dict]:
+        data = []
+        try:
+            url = '/characters/affiliation/'
+            response = await self.async_post(url, params=self.default_parameters, json=characters_ids)
+            if response.status_code == 200:
+                data = response.json()
+                expires = parse_expires(response)
+                if expires is not None:
+                    # local time as other entities timestamps
+                    expires = expires.astimezone().replace(tzinfo=None)
+                for row in data:
+                    row['expires'] = expires
+        finally:
+            self.counter += 1
+        return data
+
+    async def async_get_affiliations_split(self, characters_ids: list[int]) -> tuple[list[dict], list[int]]:
+        """Affiliations of a chunk which never raises. ESI rejects the whole chunk if any of the IDs is invalid,
+        such chunk is split in halves until invalid IDs are isolated.
+        :param characters_ids: EVE Online character IDs
+        :return: affiliations of valid IDs (empty list if chunk failed) and isolated IDs rejected by ESI
+        """
+        try:
+            return await self.async_get_affiliations_chunk(characters_ids), []
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code not in (400, 404):
+                LOGGER.error("Affiliation lookup failed for {} IDs: {}".format(len(characters_ids), e))
+                return [], []
+            if len(characters_ids) == 1:
+                LOGGER.warn("Affiliation lookup rejected for ID {}: {}".format(characters_ids[0], e.response.text))
+                return [], characters_ids
+            # every rejected request costs error limit budget
+            if self.governor.is_low():
+                LOGGER.warn("Affiliation lookup rejected for {} IDs: {}".format(len(characters_ids), e.response.text))
+                return [], []
+            half = len(characters_ids) // 2
+            data_1, rejected_1 = await self.async_get_affiliations_split(characters_ids[:half])
+            data_2, rejected_2 = await self.async_get_affiliations_split(characters_ids[half:])
+            return data_1 + data_2, rejected_1 + rejected_2
+        except Exception as e:
+            LOGGER.error("Affiliation lookup failed for {} IDs: {}".format(len(characters_ids), e), exc_info=True)
+            return [], []
+
+    async def async_get_affiliations(self, characters_ids: list[int]) -> tuple[list[dict], list[int]]:
+        """Bulk lookup of character affiliations
+        :param characters_ids: EVE Online character IDs
+        :return: list of dicts with 'character_id', 'corporation_id', 'expires' (ESI cache expiry, local time)
+                 and optional 'alliance_id', 'faction_id'; list of IDs rejected by ESI as invalid
+        """
         results = []
+        rejected = []
         try:
-            tasks = [
-                functools.partial(self.async_get_character, characters_id) for characters_id in characters_ids
+            unique_ids = list(dict.fromkeys(characters_ids))
+            chunks = [
+                unique_ids[i:i + ESI.AFFILIATION_CHUNK_SIZE]
+                for i in range(0, len(unique_ids), ESI.AFFILIATION_CHUNK_SIZE)
             ]
-            results = await aiometer.run_all(tasks, max_at_once=2, max_per_second=5)
+            # concurrency is re-evaluated for every batch according to remaining error limit budget
+            i = 0
+            while i < len(chunks):
+                max_at_once = self.governor.max_at_once()
+                # failed chunks return empty lists, results of other chunks are kept
+                tasks = [
+                    functools.partial(self.async_get_affiliations_split, chunk)
+                    for chunk in chunks[i:i + max_at_once]
+                ]
+                chunks_results = await aiometer.run_all(
+                    tasks, max_at_once=max_at_once, max_per_second=self.governor.max_per_second()
+                )
+                for chunk_results, chunk_rejected in chunks_results:
+                    results += chunk_results
+                    rejected += chunk_rejected
+                i += max_at_once
         except Exception as e:
             LOGGER.error(e, exc_info=True)
-        return results
+        return results, rejected
 
     # -----------------------------------------------------------------------------------------------------------------
     # curl - X GET "https://esi.evetech.net/latest/corporations/1/?datasource=tranquility"
     # - H "accept: application/json"
-    # - H "Cache-Control: no-cache"
     @retry(retry=RetryStrategy(), stop=stop_after_attempt(RETRIES), wait=wait_fixed(DELAY))
     def get_corporation(self, corporation_id):
-        data = None
+        data = self.entity_cache.get(entity_cache.CORPORATION, corporation_id)
+        if data is not None:
+            return data
         try:
             url = "".join(['/corporations/', str(corporation_id)])
             response = self.get(url, params=self.default_parameters)
             if response.status_code == 200:
                 data = response.json()
+                self.entity_cache.put(entity_cache.CORPORATION, corporation_id, data, response)
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 404:
                 pass
@@ -107,13 +199,17 @@ class ESI(CustomHTTPClient, metaclass=SingletonMeta):
             self.counter += 1
         return data
 
+    @single_flight
     async def async_get_corporation(self, corporation_id):
-        data = None
+        data = await self.entity_cache.async_get(entity_cache.CORPORATION, corporation_id)
+        if data is not None:
+            return data
         try:
             url = "".join(['/corporations/', str(corporation_id)])
             response = await self.async_get(url, params=self.default_parameters)
             if response.status_code == 200:
                 data = response.json()
+                await self.entity_cache.async_put(entity_cache.CORPORATION, corporation_id, data, response)
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 404:
                 pass
@@ -124,15 +220,17 @@ class ESI(CustomHTTPClient, metaclass=SingletonMeta):
     # -----------------------------------------------------------------------------------------------------------------
     # curl - X GET "https://esi.evetech.net/latest/alliances/1/?datasource=tranquility"
     # - H "accept: application/json"
-    # - H "Cache-Control: no-cache"
     @retry(retry=RetryStrategy(), stop=stop_after_attempt(RETRIES), wait=wait_fixed(DELAY))
     def get_alliance(self, alliance_id):
-        data = None
+        data = self.entity_cache.get(entity_cache.ALLIANCE, alliance_id)
+        if data is not None:
+            return data
         try:
             url = "".join(['/alliances/', str(alliance_id)])
             response = self.get(url, params=self.default_parameters)
             if response.status_code == 200:
                 data = response.json()
+                self.entity_cache.put(entity_cache.ALLIANCE, alliance_id, data, response)
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 404:
                 pass
@@ -140,13 +238,17 @@ class ESI(CustomHTTPClient, metaclass=SingletonMeta):
             self.counter += 1
         return data
 
+    @single_flight
     async def async_get_alliance(self, alliance_id):
-        data = None
+        data = await self.entity_cache.async_get(entity_cache.ALLIANCE, alliance_id)
+        if data is not None:
+            return data
         try:
             url = "".join(['/alliances/', str(alliance_id)])
             response = await self.async_get(url, params=self.default_parameters)
             if response.status_code == 200:
                 data = response.json()
+                await self.entity_cache.async_put(entity_cache.ALLIANCE, alliance_id, data, response)
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 404:
                 pass
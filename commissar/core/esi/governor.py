@@ -0,0 +1,91 @@
+"""ESI error limit tracking, see https://developers.eveonline.com/blog/article/esi-error-limits-go-live
+"""
+import asyncio
+import time
+from threading import Lock
+
+from httpx import Response
+
+from commissar import LOGGER
+
+
+class ErrorLimitGovernor:
+    """Tracks ESI error limit budget from response headers and throttles callers when it runs low
+    """
+
+    REMAIN_HEADER = 'X-ESI-Error-Limit-Remain'
+    RESET_HEADER = 'X-ESI-Error-Limit-Reset'
+    LIMIT = 100             # ESI errors allowed per window
+    LOW_WATERMARK = 20      # pause all requests until window reset below this value
+    MAX_AT_ONCE = 2
+    MAX_PER_SECOND = 5
+
+    def __init__(self):
+        self.remain = ErrorLimitGovernor.LIMIT
+        self.reset_at = 0.0
+        self.paused = 0
+        self._lock = Lock()
+
+    def update(self, response: Response) -> None:
+        """Reads error limit headers from any ESI response, including failed ones
+        :param response: ESI response
+        """
+        remain = response.headers.get(ErrorLimitGovernor.REMAIN_HEADER)
+        reset = response.headers.get(ErrorLimitGovernor.RESET_HEADER)
+        if remain is None or reset is None:
+            return
+        try:
+            remain = int(remain)
+            reset_at = time.monotonic() + int(reset)
+        except ValueError:
+            return
+        with self._lock:
+            self.remain = remain
+            self.reset_at = reset_at
+        if remain < ErrorLimitGovernor.LOW_WATERMARK:
+            LOGGER.warn("ESI error limit is low: {} remain, reset in {}s".format(remain, reset))
+
+    def budget(self) -> int:
+        """Current error budget, restored to full once the window has been reset
+        """
+        with self._lock:
+            if time.monotonic() >= self.reset_at:
+                return ErrorLimitGovernor.LIMIT
+            return self.remain
+
+    def is_low(self) -> bool:
+        return self.budget() < ErrorLimitGovernor.LOW_WATERMARK
+
+    def delay(self) -> float:
+        """Seconds to wait before sending next request
+        """
+        if not self.is_low():
+            return 0
+        return max(0.0, self.reset_at - time.monotonic())
+
+    def max_at_once(self) -> int:
+        return max(1, round(ErrorLimitGovernor.MAX_AT_ONCE * self.budget() / ErrorLimitGovernor.LIMIT))
+
+    def max_per_second(self) -> float:
+        return max(1, round(ErrorLimitGovernor.MAX_PER_SECOND * self.budget() / ErrorLimitGovernor.LIMIT))
+
+    def wait(self) -> None:
+        delay = self.delay()
+        if delay > 0:
+            self.paused += 1
+            LOGGER.warn("ESI error limit reached. Pausing for {:.1f}s".format(delay))
+            time.sleep(delay)
+
+    async def async_wait(self) -> None:
+        delay = self.delay()
+        if delay > 0:
+            self.paused += 1
+            LOGGER.warn("ESI error limit reached. Pausing for {:.1f}s".format(delay))
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "remain": self.budget(),
+            "limit": ErrorLimitGovernor.LIMIT,
+            "paused": self.paused
+        }
@@ -1,13 +1,74 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from threading import Lock
+
 import httpx
 from httpx import Response
 
+from commissar.core.esi.governor import ErrorLimitGovernor
+
+
+class CachedResponse:
+    """Cached successful response with its validator and expiry time
+    """
+
+    def __init__(self, response: Response, etag: str = None, expires: datetime = None):
+        self.response = response
+        self.etag = etag
+        self.expires = expires
+
+    def is_fresh(self) -> bool:
+        return self.expires is not None and datetime.now(timezone.utc) < self.expires
+
+
+class ResponseCache:
+    """LRU cache of GET responses keyed by URL and query parameters
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def key(url, params=None) -> tuple:
+        return url, tuple(sorted(params.items())) if params is not None else ()
+
+    def get(self, key) -> CachedResponse:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry: CachedResponse) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+def parse_expires(response: Response) -> datetime:
+    value = response.headers.get('Expires')
+    if value is None:
+        return None
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
 
 class CustomHTTPClient:
     TIMEOUT = 10
+    CACHE_SIZE = 10000
 
-    def __init__(self, base_url, default_headers):
+    def __init__(self, base_url, default_headers, governor: ErrorLimitGovernor = None):
         self.base_url = base_url
         self.default_headers = default_headers
+        self.governor = governor
+        self.cache = ResponseCache(CustomHTTPClient.CACHE_SIZE)
         self.client = httpx.Client(
             base_url=base_url,
             headers=default_headers,
@@ -19,23 +80,64 @@ class CustomHTTPClient:
             timeout=CustomHTTPClient.TIMEOUT
         )
 
-    def get(self, url, headers=None, params=None) -> Response:
-        response = self.client.get(url, headers=headers, params=params)
+    @staticmethod
+    def conditional_headers(entry: CachedResponse, headers=None) -> dict:
+        headers = dict(headers) if headers is not None else {}
+        if entry is not None and entry.etag is not None:
+            headers['If-None-Match'] = entry.etag
+        return headers
+
+    def process_response(self, key, entry: CachedResponse, response: Response) -> Response:
+        """Returns cached response on '304 Not Modified' and stores cacheable successful responses
+        """
+        if self.governor is not None:
+            self.governor.update(response)
+        if response.status_code == 304 and entry is not None:
+            entry.expires = parse_expires(response) or entry.expires
+            self.cache.put(key, entry)
+            return entry.response
         response.raise_for_status()
+        if response.status_code == 200:
+            etag = response.headers.get('ETag')
+            expires = parse_expires(response)
+            if etag is not None or expires is not None:
+                self.cache.put(key, CachedResponse(response, etag, expires))
         return response
 
+    def get(self, url, headers=None, params=None) -> Response:
+        key = ResponseCache.key(url, params)
+        entry = self.cache.get(key)
+        if entry is not None and entry.is_fresh():
+            return entry.response
+        if self.governor is not None:
+            self.governor.wait()
+        response = self.client.get(url, headers=self.conditional_headers(entry, headers), params=params)
+        return self.process_response(key, entry, response)
+
     async def async_get(self, url, headers=None, params=None) -> Response:
-        response = await self.async_client.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        return response
+        key = ResponseCache.key(url, params)
+        entry = self.cache.get(key)
+        if entry is not None and entry.is_fresh():
+            return entry.response
+        if self.governor is not None:
+            await self.governor.async_wait()
+        response = await self.async_client.get(url, headers=self.conditional_headers(entry, headers), params=params)
+        return self.process_response(key, entry, response)
 
-    async def post(self, url, headers=None, params=None, data=None) -> Response:
-        response = self.client.post(url, headers=headers, params=params, data=data)
+    def post(self, url, headers=None, params=None, data=None, json=None) -> Response:
+        if self.governor is not None:
+            self.governor.wait()
+        response = self.client.post(url, headers=headers, params=params, data=data, json=json)
+        if self.governor is not None:
+            self.governor.update(response)
         response.raise_for_status()
         return response
 
-    async def async_post(self, url, headers=None, params=None, data=None) -> Response:
-        response = await self.async_client.post(url, headers=headers, params=params, data=data)
+    async def async_post(self, url, headers=None, params=None, data=None, json=None) -> Response:
+        if self.governor is not None:
+            await self.governor.async_wait()
+        response = await self.async_client.post(url, headers=headers, params=params, data=data, json=json)
+        if self.governor is not None:
+            self.governor.update(response)
         response.raise_for_status()
         return response
-
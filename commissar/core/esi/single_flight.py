@@ -0,0 +1,27 @@
+"""Request coalescing for async calls
+"""
+import asyncio
+import functools
+
+
+def single_flight(func):
+    """Decorator which makes concurrent calls with the same arguments share one in-flight call.
+    Calls are keyed by decorated function (endpoint) and its arguments (entity ID)
+    :param func: coroutine function
+    :return: wrapped coroutine function
+    """
+    in_flight = {}
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        task = in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            in_flight[key] = task
+            task.add_done_callback(lambda _: in_flight.pop(key, None))
+        # cancellation of one caller should not cancel the call for others
+        return await asyncio.shield(task)
+
+    wrapper.in_flight = in_flight
+    return wrapper
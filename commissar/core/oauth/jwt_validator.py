@@ -1,3 +1,6 @@
+import threading
+import time
+
 import httpx
 from jose import jwt, ExpiredSignatureError, JWTError
 
@@ -12,21 +15,29 @@ class JWTValidator:
     JWK_ALGORITHM = "RS256"
     JWK_ISSUERS = ("login.eveonline.com", "https://login.eveonline.com")
     JWK_AUDIENCE = "EVE Online"
+    JWKS_TTL_SECONDS = 60 * 60
+    JWKS_MIN_REFRESH_INTERVAL_SECONDS = 60  # limits refreshes caused by unknown key IDs
+    TIMEOUT = 10
+
+    __client = httpx.Client(timeout=TIMEOUT)
+    __lock = threading.Lock()
+    __keys = {}
+    __fetched_at = None
+    __refresh_timer = None
 
     @staticmethod
-    def __validate_eve_jwt(token: str) -> dict:
-        """Validate a JWT access token retrieved from the EVE SSO.
-        :param token: A JWT access token originating from the EVE SSO
-        :return: contents of the validated JWT access token if there are no errors
+    def __fetch_keys() -> dict:
+        """Fetches JWKs from SSO
+        :return: JWKs with requested algorithm by key ID
         """
-        client = httpx.Client()
+        client = JWTValidator.__client
         try:
             # fetch JWKs URL from meta data endpoint
             res = client.get(JWTValidator.SSO_META_DATA_URL)
             res.raise_for_status()
             data = res.json()
             jwks_uri = data["jwks_uri"]
-        except ConnectionError as e:
+        except (ConnectionError, httpx.TransportError) as e:
             raise RuntimeError("Couldn't contact validation service", e)
         except KeyError as e:
             raise RuntimeError(
@@ -44,8 +55,70 @@ class JWTValidator:
                 f"Invalid data received from the the jwks endpoint: {data}"
             ) from None
 
-        # pick the JWK with the requested alogorithm
-        jwk_set = [item for item in jwk_sets if item["alg"] == JWTValidator.JWK_ALGORITHM].pop()
+        # keep JWKs with the requested algorithm
+        return {item.get("kid"): item for item in jwk_sets if item["alg"] == JWTValidator.JWK_ALGORITHM}
+
+    @staticmethod
+    def refresh_keys() -> None:
+        keys = JWTValidator.__fetch_keys()
+        with JWTValidator.__lock:
+            JWTValidator.__keys = keys
+            JWTValidator.__fetched_at = time.monotonic()
+        LOGGER.debug("JWKs refreshed: {}".format(list(keys.keys())))
+
+    @staticmethod
+    def start_background_refresh() -> None:
+        """Keeps JWKs cache warm by refreshing it every JWKS_TTL_SECONDS in a daemon thread
+        """
+        def run():
+            try:
+                JWTValidator.refresh_keys()
+            except Exception as e:
+                LOGGER.error(e, exc_info=True)
+            finally:
+                timer = threading.Timer(JWTValidator.JWKS_TTL_SECONDS, run)
+                timer.daemon = True
+                JWTValidator.__refresh_timer = timer
+                timer.start()
+
+        if JWTValidator.__refresh_timer is None:
+            run()
+
+    @staticmethod
+    def __get_key(kid: str) -> dict:
+        """Returns cached JWK, cache is refreshed if expired or key ID is unknown
+        :param kid: key ID from token header
+        :return: JWK
+        """
+        with JWTValidator.__lock:
+            keys = JWTValidator.__keys
+            fetched_at = JWTValidator.__fetched_at
+        key = JWTValidator.__pick_key(keys, kid)
+        age = time.monotonic() - fetched_at if fetched_at is not None else None
+        expired = age is None or age > JWTValidator.JWKS_TTL_SECONDS
+        if expired or (key is None and age > JWTValidator.JWKS_MIN_REFRESH_INTERVAL_SECONDS):
+            JWTValidator.refresh_keys()
+            with JWTValidator.__lock:
+                keys = JWTValidator.__keys
+            key = JWTValidator.__pick_key(keys, kid)
+        if key is None:
+            raise JWTError(f"Unknown JWK: {kid}")
+        return key
+
+    @staticmethod
+    def __pick_key(keys: dict, kid: str) -> dict:
+        if kid is not None:
+            return keys.get(kid)
+        return next(iter(keys.values()), None)
+
+    @staticmethod
+    def __validate_eve_jwt(token: str) -> dict:
+        """Validate a JWT access token retrieved from the EVE SSO.
+        :param token: A JWT access token originating from the EVE SSO
+        :return: contents of the validated JWT access token if there are no errors
+        """
+        header = jwt.get_unverified_header(token)
+        jwk_set = JWTValidator.__get_key(header.get("kid"))
 
         # try to decode the token and validate it against expected values
         # will raise JWT exceptions if decoding fails or expected values do not match
@@ -80,4 +153,3 @@ class JWTValidator:
             yield token_content['tenant']
             yield token_content['sub']
             yield token_content['name']
-
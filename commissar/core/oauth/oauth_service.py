@@ -18,8 +18,13 @@ class OAuthService(metaclass=SingletonMeta):
     HOST = 'login.eveonline.com'
     BASE_URL = 'https://login.eveonline.com/v2/oauth'
     CONTENT_TYPE = 'application/x-www-form-urlencoded'
+    TIMEOUT = 10
+    LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60)
 
     def __init__(self):
+        # long-lived pooled clients to keep connections to SSO alive between calls
+        self.client = httpx.Client(timeout=OAuthService.TIMEOUT, limits=OAuthService.LIMITS)
+        self.async_client = httpx.AsyncClient(timeout=OAuthService.TIMEOUT, limits=OAuthService.LIMITS)
         try:
             cfg = ConfigLoader().config
             self.client_id = os.environ["esi_client_id"]
@@ -31,10 +36,7 @@ class OAuthService(metaclass=SingletonMeta):
         except KeyError as e:
             LOGGER.warn(e, exc_info=True)
 
-    def authorize(self) -> AuthorizationInfo:
-        """OAuth 2.0 authorize call
-        :return: authorization info
-        """
+    def __authorize_params(self) -> tuple:
         code_verifier = helpers.gen_code_verifier()
         state = str(uuid.uuid1())
         code_challenge = helpers.gen_code_challenge(code_verifier)
@@ -47,8 +49,10 @@ class OAuthService(metaclass=SingletonMeta):
             'code_challenge_method': 'S256',
             'state': state
         }
-        url = "".join([OAuthService.BASE_URL, '/authorize/'])
-        response = httpx.get(url, params=params)
+        return code_verifier, state, params
+
+    @staticmethod
+    def __authorize_result(response: httpx.Response, code_verifier: str, state: str) -> AuthorizationInfo:
         if response.status_code == 302:
             location_url = response.headers["location"]
             i = AuthorizationInfo(code_verifier, state, location_url)
@@ -56,12 +60,7 @@ class OAuthService(metaclass=SingletonMeta):
         else:
             LOGGER.error(response.text)
 
-    def get_access_token(self, code: str, code_verifier: str) -> AccessInfo:
-        """OAuth 2.0 access token call
-        :param code: Authorization Code from OAuth 2.0 authorize
-        :param code_verifier: Code Verifier
-        :return: Access Token info
-        """
+    def __access_token_request(self, code: str, code_verifier: str) -> tuple:
         headers = {
             "Content-Type": OAuthService.CONTENT_TYPE,
             "Host": OAuthService.HOST,
@@ -72,22 +71,9 @@ class OAuthService(metaclass=SingletonMeta):
             "client_id": self.client_id,
             "code_verifier": code_verifier
         }
-        url = "".join([OAuthService.BASE_URL, '/token'])
-        response = httpx.post(url, headers=headers, data=payload)
-        access_info = None
-        if response.status_code == 200:
-            access_info = parse_token_response(response.json())
-        else:
-            LOGGER.error(response.text)
-            _json = json.loads(response.text)
-            raise RuntimeError(_json['error_description'])
-        return access_info
+        return headers, payload
 
-    def refresh_access_token(self, refresh_token: str) -> AccessInfo:
-        """OAuth 2.0 refresh access token call
-        :param refresh_token: Refresh Token from current Access Token info
-        :return: refreshed Access Token info
-        """
+    def __refresh_token_request(self, refresh_token: str) -> tuple:
         headers = {
             "Content-Type": OAuthService.CONTENT_TYPE,
             "Host": OAuthService.HOST,
@@ -97,8 +83,10 @@ class OAuthService(metaclass=SingletonMeta):
             "grant_type": "refresh_token",
             "refresh_token": refresh_token
         }
-        url = "".join([OAuthService.BASE_URL, '/token'])
-        response = httpx.post(url, headers=headers, data=payload)
+        return headers, payload
+
+    @staticmethod
+    def __token_result(response: httpx.Response) -> AccessInfo:
         if response.status_code == 200:
             return parse_token_response(response.json())
         else:
@@ -106,6 +94,66 @@ class OAuthService(metaclass=SingletonMeta):
             _json = json.loads(response.text)
             raise RuntimeError(_json['error_description'])
 
+    def authorize(self) -> AuthorizationInfo:
+        """OAuth 2.0 authorize call
+        :return: authorization info
+        """
+        code_verifier, state, params = self.__authorize_params()
+        url = "".join([OAuthService.BASE_URL, '/authorize/'])
+        response = self.client.get(url, params=params)
+        return self.__authorize_result(response, code_verifier, state)
+
+    async def async_authorize(self) -> AuthorizationInfo:
+        """OAuth 2.0 authorize call, non-blocking version
+        :return: authorization info
+        """
+        code_verifier, state, params = self.__authorize_params()
+        url = "".join([OAuthService.BASE_URL, '/authorize/'])
+        response = await self.async_client.get(url, params=params)
+        return self.__authorize_result(response, code_verifier, state)
+
+    def get_access_token(self, code: str, code_verifier: str) -> AccessInfo:
+        """OAuth 2.0 access token call
+        :param code: Authorization Code from OAuth 2.0 authorize
+        :param code_verifier: Code Verifier
+        :return: Access Token info
+        """
+        headers, payload = self.__access_token_request(code, code_verifier)
+        url = "".join([OAuthService.BASE_URL, '/token'])
+        response = self.client.post(url, headers=headers, data=payload)
+        return self.__token_result(response)
+
+    async def async_get_access_token(self, code: str, code_verifier: str) -> AccessInfo:
+        """OAuth 2.0 access token call, non-blocking version
+        :param code: Authorization Code from OAuth 2.0 authorize
+        :param code_verifier: Code Verifier
+        :return: Access Token info
+        """
+        headers, payload = self.__access_token_request(code, code_verifier)
+        url = "".join([OAuthService.BASE_URL, '/token'])
+        response = await self.async_client.post(url, headers=headers, data=payload)
+        return self.__token_result(response)
+
+    def refresh_access_token(self, refresh_token: str) -> AccessInfo:
+        """OAuth 2.0 refresh access token call
+        :param refresh_token: Refresh Token from current Access Token info
+        :return: refreshed Access Token info
+        """
+        headers, payload = self.__refresh_token_request(refresh_token)
+        url = "".join([OAuthService.BASE_URL, '/token'])
+        response = self.client.post(url, headers=headers, data=payload)
+        return self.__token_result(response)
+
+    async def async_refresh_access_token(self, refresh_token: str) -> AccessInfo:
+        """OAuth 2.0 refresh access token call, non-blocking version
+        :param refresh_token: Refresh Token from current Access Token info
+        :return: refreshed Access Token info
+        """
+        headers, payload = self.__refresh_token_request(refresh_token)
+        url = "".join([OAuthService.BASE_URL, '/token'])
+        response = await self.async_client.post(url, headers=headers, data=payload)
+        return self.__token_result(response)
+
     def refresh_access_token_if_needed(self, access_info: AccessInfo) -> AccessInfo:
         """Method for handling optionally expired Access Token
         :param access_info: current Access Token info